@@ -1,11 +1,31 @@
 # bot.py
+import asyncio
+import contextlib
 import logging
 import os
-from telegram.ext import ApplicationBuilder, CommandHandler
-from config import TOKEN, WELCOME_TEXT
+import signal
+from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes
+from config import (
+    TOKEN, WELCOME_TEXT, MENU_WATCH_INTERVAL, PHOTO_WARMUP_CHAT_ID,
+    CONCURRENT_UPDATES, DEBOUNCE_WINDOW,
+    SESSION_DB, SESSION_FLUSH_INTERVAL, SESSION_MAX_ACTIVE, SESSION_TTL,
+    RATE_LIMIT_OVERALL, RATE_LIMIT_CHAT, RATE_LIMIT_CHAT_BURST, RATE_LIMIT_GROUP, RATE_LIMIT_MAX_RETRIES,
+    UPDATE_QUEUE_SIZE, UPDATE_DEDUP_SIZE, WORKER_PROCESSES, TG_API_BASE_URL,
+    METRICS_PATH, METRICS_TOKEN,
+    BROADCAST_BATCH, BROADCAST_PROGRESS_INTERVAL, BROADCAST_LEASE,
+)
 from handlers.menu import start_menu, register_handlers as menu_register
 from handlers.admin import register_handlers as admin_register
+from handlers.search import open_deep_link, register_handlers as search_register
 from handlers.menu import menu_manager
+from core.photo_cache import photo_cache
+from core.updates import ChatOrderedUpdateProcessor
+from core.ratelimit import BotRateLimiter
+from core.sessions import BotContext, sessions
+from core.broadcast import broadcaster
+from core.webhook import UpdateQueue, make_webhook_app, serve_until_stopped
+from core.workers import run_front
+from core.metrics import registry, timed
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -13,11 +33,15 @@ logger = logging.getLogger(__name__)
 # === Webhook config ===
 WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # Render дає цей URL
 PORT = int(os.getenv("PORT", 8080))     # Render використовує PORT із env
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")  # необов'язковий secret_token для setWebhook
 # ======================
 
 
 # Команди
 async def start_cmd(update, context):
+    # /start m_... — перехід з inline-пошуку одразу в потрібний розділ
+    if await open_deep_link(update, context):
+        return
     await start_menu(update, context)
 
 async def help_cmd(update, context):
@@ -25,6 +49,7 @@ async def help_cmd(update, context):
         "/start — головне меню\n"
         "/help — ця довідка\n"
         "/about — коротко про університет\n"
+        "/search <запит> — пошук по розділах меню\n"
         "/reload — перезавантажити menu.json (тільки адміни)\n"
     )
     await update.message.reply_text(text)
@@ -34,33 +59,170 @@ async def about_cmd(update, context):
     await update.message.reply_text(about)
 
 
-def main():
+async def post_init(application):
+    # сесії користувачів: SQLite + відкладений запис
+    sessions.configure(SESSION_MAX_ACTIVE, SESSION_TTL)
+    sessions.open(SESSION_DB)
+    sessions.start_flushing(SESSION_FLUSH_INTERVAL)
+    # розсилки: реєстр користувачів і контрольні точки — у тій самій базі;
+    # незавершену розсилку (після рестарту) підхоплюємо у фоні
+    if sessions.store is not None:
+        broadcaster.configure(BROADCAST_BATCH, BROADCAST_PROGRESS_INTERVAL, BROADCAST_LEASE)
+        broadcaster.open(sessions.store)
+        broadcaster.start_watching(application.bot)
+    # автоматичне перезавантаження меню при зміні файлів у data/
+    menu_manager.start_watching(MENU_WATCH_INTERVAL)
+    # прогрів кешу file_id у фоні, щоб не затримувати старт
+    if PHOTO_WARMUP_CHAT_ID:
+        photo_cache.start_warmup(application.bot, PHOTO_WARMUP_CHAT_ID, menu_manager.snapshot.image_urls())
+
+async def post_stop(application):
+    # розсилка дошле поточну пачку, поки бот ще може надсилати запити
+    await broadcaster.close()
+
+async def post_shutdown(application):
+    await menu_manager.stop_watching()
+    await broadcaster.close()
+    await sessions.close()
+
+
+def _check_token():
     if TOKEN == 'PUT_YOUR_TOKEN_HERE' or not TOKEN:
         raise RuntimeError("TG_BOT_TOKEN не вказаний в .env або в середовищі")
 
-    application = ApplicationBuilder().token(TOKEN).build()
+
+def build_application():
+    _check_token()
+    builder = ApplicationBuilder().token(TOKEN)
+    if TG_API_BASE_URL:
+        builder = builder.base_url(TG_API_BASE_URL)
+    application = (
+        builder
+        .context_types(ContextTypes(context=BotContext))
+        .concurrent_updates(ChatOrderedUpdateProcessor(CONCURRENT_UPDATES, DEBOUNCE_WINDOW, on_update=sessions.seen))
+        .rate_limiter(BotRateLimiter(
+            # загальний ліміт Telegram один на токен — ділимо його між воркер-процесами
+            overall_rate=RATE_LIMIT_OVERALL / WORKER_PROCESSES if WORKER_PROCESSES > 1 else RATE_LIMIT_OVERALL,
+            chat_rate=RATE_LIMIT_CHAT,
+            chat_burst=RATE_LIMIT_CHAT_BURST,
+            group_rate=RATE_LIMIT_GROUP,
+            max_retries=RATE_LIMIT_MAX_RETRIES,
+        ))
+        .post_init(post_init)
+        .post_stop(post_stop)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
 
     # Зберігаємо привітальний текст у bot_data
     application.bot_data['welcome_text'] = WELCOME_TEXT
 
     # Стандартні команди
-    application.add_handler(CommandHandler('start', start_cmd))
+    application.add_handler(CommandHandler('start', timed("start", "command", start_cmd)))
     application.add_handler(CommandHandler('help', help_cmd))
     application.add_handler(CommandHandler('about', about_cmd))
 
     # Реєстрація хендлерів меню та адмін-панелі
     menu_register(application)
+    search_register(application)
     admin_register(application)
+    register_metrics(application)
+    return application
+
+
+def register_metrics(application):
+    """Gauge-и й лічильники зі статистики компонентів бота — обчислюються лише під час запиту /metrics."""
+    registry.register_stats("bot_menu", lambda: {
+        "version": menu_manager.snapshot.version,
+        "nodes": len(menu_manager.snapshot.nodes),
+    }, "Menu snapshot")
+    registry.register_stats("bot_plan_cache", menu_manager.plan_cache_stats, "Precompiled menu replies",
+                            counters=("hits", "misses"))
+    registry.register_stats("bot_photo_cache", photo_cache.stats, "Photo file_id cache",
+                            counters=("hits", "misses", "cached_sends", "uncached_sends"))
+    registry.register_stats("bot_sessions", sessions.stats, "User sessions",
+                            counters=("hits", "loads", "flushes", "written", "evicted_lru", "evicted_ttl", "lost"))
+    registry.register_stats("bot_update_processor", application.update_processor.stats, "Update processor",
+                            counters=("coalesced", "dropped"))
+    registry.register_stats("bot_rate_limiter", application.bot.rate_limiter.stats, "Bot API rate limiter",
+                            counters=("requests", "limited", "retries", "failed_retries"))
+    registry.register_stats("bot_broadcast", broadcaster.stats, "Broadcast to all users")
 
-    logger.info("Bot started (webhook mode).")
 
-    # === запуск через webhook ===
-    application.run_webhook(
-        listen="0.0.0.0",
-        port=PORT,
-        url_path=TOKEN,
-        webhook_url=f"{WEBHOOK_URL}/{TOKEN}"
+def _stop_event():
+    """Event, що спрацьовує на SIGINT/SIGTERM (Render зупиняє сервіс через SIGTERM)."""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        with contextlib.suppress(NotImplementedError):  # Windows
+            loop.add_signal_handler(sig, stop.set)
+    return stop
+
+
+async def run_webhook(application):
+    """
+    Життєвий цикл бота у webhook-режимі: власний aiohttp-сервер одразу відповідає
+    Telegram 200 і кладе оновлення у внутрішню чергу, з якої їх розбирає диспетчер.
+    """
+    queue = UpdateQueue(
+        application,
+        maxsize=UPDATE_QUEUE_SIZE,
+        max_pending=UPDATE_QUEUE_SIZE,
+        dedup_size=UPDATE_DEDUP_SIZE,
     )
+    application.bot_data['update_queue'] = queue
+    registry.register_stats("bot_update_queue", queue.stats, "Webhook update queue", counters=UpdateQueue.COUNTERS)
+    stop = _stop_event()
+
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        queue.start()
+        await application.bot.set_webhook(
+            url=f"{WEBHOOK_URL}/{TOKEN}",
+            secret_token=WEBHOOK_SECRET or None,
+        )
+        logger.info("Bot started (webhook mode).")
+        await serve_until_stopped(
+            make_webhook_app(
+                queue.offer, f"/{TOKEN}", WEBHOOK_SECRET or None,
+                metrics=registry.render, metrics_path=METRICS_PATH, metrics_token=METRICS_TOKEN or None,
+            ),
+            "0.0.0.0", PORT, stop,
+        )
+    finally:
+        await queue.stop()
+        if application.running:
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+
+
+async def run_workers():
+    """Фронт-процес: приймає webhook і розподіляє оновлення між WORKER_PROCESSES воркерами."""
+    await run_front(
+        TOKEN, WEBHOOK_URL, PORT, WORKER_PROCESSES, _stop_event(),
+        secret_token=WEBHOOK_SECRET or None,
+        queue_size=UPDATE_QUEUE_SIZE,
+        dedup_size=UPDATE_DEDUP_SIZE,
+        base_url=TG_API_BASE_URL or None,
+        metrics_path=METRICS_PATH,
+        metrics_token=METRICS_TOKEN or None,
+    )
+
+
+def main():
+    if WORKER_PROCESSES > 1:
+        _check_token()
+        asyncio.run(run_workers())
+        return
+    application = build_application()
+    asyncio.run(run_webhook(application))
 
 if __name__ == '__main__':
     main()
@@ -15,7 +15,84 @@ DATA_DIR = BASE_DIR / 'data'
 MENU_FILE = DATA_DIR / 'menu.json'
 INFO_FILE = DATA_DIR / 'info.json'
 
+# Робочий стан бота (кеші, сховища) — поруч з data/, можна винести на постійний диск
+STATE_DIR = Path(os.getenv('STATE_DIR', BASE_DIR / 'state'))
+PHOTO_CACHE_FILE = STATE_DIR / 'photo_file_ids.json'
+# Скомпільоване меню (python -m tools.compile_content); застарілий файл ігнорується
+MENU_SNAPSHOT_FILE = STATE_DIR / 'menu_snapshot.bin'
+# Сесії користувачів (прогрес тесту, id картинок); порожній рядок — лише в пам'яті
+SESSION_DB = os.getenv('SESSION_DB', str(STATE_DIR / 'sessions.sqlite3')).strip()
+# Як часто (сек) записувати змінені сесії на диск
+SESSION_FLUSH_INTERVAL = float(os.getenv('SESSION_FLUSH_INTERVAL', '5'))
+# Скільки сесій тримати в пам'яті (найдавніші витісняються) та час простою до витіснення (сек);
+# 0 — без меж. Ліміт рахує сесії, а не байти: типова сесія (тест у процесі, id картинок) займає
+# близько 1 КБ, тож 10000 сесій — приблизно 10 МБ; великі значення в user_data не враховуються
+SESSION_MAX_ACTIVE = int(os.getenv('SESSION_MAX_ACTIVE', '10000'))
+SESSION_TTL = float(os.getenv('SESSION_TTL', '3600'))
+# Розсилка (/broadcast): скільки користувачів надсилати за раз (контрольна точка — після
+# кожної пачки), раз на скільки секунд оновлювати повідомлення з прогресом, і через скільки
+# секунд без ознак життя розсилку підхоплює інший процес (після рестарту чи падіння)
+BROADCAST_BATCH = int(os.getenv('BROADCAST_BATCH', '50'))
+BROADCAST_PROGRESS_INTERVAL = float(os.getenv('BROADCAST_PROGRESS_INTERVAL', '5'))
+BROADCAST_LEASE = float(os.getenv('BROADCAST_LEASE', '30'))
+# Службовий чат для прогріву кешу file_id при старті; порожньо — не прогрівати
+PHOTO_WARMUP_CHAT_ID = os.getenv('PHOTO_WARMUP_CHAT_ID', '').strip()
+
+# Як часто (сек) перевіряти mtime файлів у data/ і перезавантажувати меню; 0 — вимкнено
+MENU_WATCH_INTERVAL = float(os.getenv('MENU_WATCH_INTERVAL', '0'))
+
+# Скільки оновлень обробляти одночасно (різні чати паралельно, один чат — по черзі)
+CONCURRENT_UPDATES = max(1, int(os.getenv('CONCURRENT_UPDATES', '32')))
+# Внутрішня черга webhook-оновлень: ліміт довжини (далі — 503, Telegram повторить пізніше)
+# і скільки останніх update_id пам'ятати, щоб відкидати повторні доставки
+UPDATE_QUEUE_SIZE = int(os.getenv('UPDATE_QUEUE_SIZE', '1000'))
+UPDATE_DEDUP_SIZE = int(os.getenv('UPDATE_DEDUP_SIZE', '10000'))
+# Кількість воркер-процесів; 0 або 1 — усе в одному процесі
+WORKER_PROCESSES = int(os.getenv('WORKER_PROCESSES', '0'))
+# /reload потрапляє лише в один воркер — решта підхоплює зміни data/ через стеження
+if WORKER_PROCESSES > 1 and not MENU_WATCH_INTERVAL:
+    MENU_WATCH_INTERVAL = 5.0
+# Вікно (сек), в якому повторне натискання тієї ж кнопки меню лише підтверджується; 0 — вимкнено
+DEBOUNCE_WINDOW = float(os.getenv('DEBOUNCE_WINDOW', '0.7'))
+
+# Метрики Prometheus на тому ж порту, що й webhook; порожній шлях — вимкнено.
+# METRICS_TOKEN — якщо задано, /metrics вимагає заголовок Authorization: Bearer <token>
+METRICS_PATH = os.getenv('METRICS_PATH', '/metrics').strip()
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '').strip()
+# Як часто (сек) воркер-процеси передають свої метрики фронту
+METRICS_PUSH_INTERVAL = float(os.getenv('METRICS_PUSH_INTERVAL', '5'))
+
+# Оновлення, оброблені довше за цей поріг (сек), логуються з розкладкою по спанах
+# (хендлери, черга чату, кожен запит до Bot API); 0 — трасування вимкнено
+SLOW_UPDATE_THRESHOLD = float(os.getenv('SLOW_UPDATE_THRESHOLD', '1.0'))
+
+# Ліміти вихідних запитів до Bot API (повідомлень за секунду).
+# RATE_LIMIT_OVERALL — на бота загалом: при WORKER_PROCESSES > 1 кожен воркер отримує
+# RATE_LIMIT_OVERALL / WORKER_PROCESSES (разом з запасом відправки). Ліміти чату й групи не ділимо:
+# кожен чат обслуговує лише один воркер.
+RATE_LIMIT_OVERALL = float(os.getenv('RATE_LIMIT_OVERALL', '30'))
+RATE_LIMIT_CHAT = float(os.getenv('RATE_LIMIT_CHAT', '1'))
+RATE_LIMIT_CHAT_BURST = float(os.getenv('RATE_LIMIT_CHAT_BURST', '5'))
+RATE_LIMIT_GROUP = float(os.getenv('RATE_LIMIT_GROUP', str(20 / 60)))
+RATE_LIMIT_MAX_RETRIES = int(os.getenv('RATE_LIMIT_MAX_RETRIES', '3'))
+
+# Адреса Bot API (префікс перед токеном); порожньо — справжній Telegram.
+# Для навантажувальних тестів: http://127.0.0.1:8081/bot (див. tools/fake_bot_api.py)
+TG_API_BASE_URL = os.getenv('TG_API_BASE_URL', '').strip()
+
 # Callback prefix — для розпізнавання наших callback-ів
 CB_PREFIX = 'menu:'
+# Префікс кроків профорієнтаційного тесту без стану на сервері
+CAREER_CB_PREFIX = 'ct:'
+
+# 1 — прогрес тесту передається в callback_data кнопок (будь-який воркер продовжить тест,
+# старі кнопки не зламають його); 0 — зберігається в user_data, як раніше
+CAREER_TEST_STATELESS = os.getenv('CAREER_TEST_STATELESS', '1').strip().lower() not in ('0', 'false', 'no', '')
+
+# Пошук по меню (/search та inline-режим): скільки результатів показувати
+# і скільки секунд Telegram може кешувати відповідь на inline-запит
+SEARCH_RESULTS = int(os.getenv('SEARCH_RESULTS', '8'))
+SEARCH_INLINE_RESULTS = int(os.getenv('SEARCH_INLINE_RESULTS', '20'))
+SEARCH_INLINE_CACHE_TIME = int(os.getenv('SEARCH_INLINE_CACHE_TIME', '300'))
 
 WELCOME_TEXT = 'Ласкаво просимо до бота профорієнтації університету! Оберіть пункт меню.'
@@ -0,0 +1,2 @@
+# core/__init__.py
+# Package init for core
\ No newline at end of file
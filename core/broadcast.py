@@ -0,0 +1,363 @@
+# core/broadcast.py
+"""
+Розсилка повідомлення всім користувачам з реєстру (таблиця users, див. core/sessions.py).
+
+- Розсилка — фонова задача: користувачі беруться пачками за зростанням user_id,
+  пачка надсилається паралельно через BotRateLimiter з PRIORITY_BULK, тож темп —
+  максимальний дозволений лімітером, а відповіді живим користувачам ідуть першими.
+- RetryAfter від Telegram ставить на паузу всю розсилку, а не лише один запит:
+  сервер однаково відхилятиме решту.
+- Після кожної пачки в SQLite пишеться контрольна точка (останній user_id і лічильники).
+  Після рестарту чи падіння розсилку підхоплює процес, який помітить, що власник
+  не подавав ознак життя довше за lease, — і продовжує з контрольної точки.
+- Прогрес і швидкість — редагуванням службового повідомлення в чаті адміна.
+"""
+
+import asyncio
+import contextlib
+import logging
+import os
+import socket
+import time
+
+from telegram.error import Forbidden, RetryAfter, TelegramError
+
+from core.ratelimit import PRIORITY_BULK
+
+logger = logging.getLogger(__name__)
+
+# RetryAfter не повторюється в лімітері — розсилка обробляє його сама, для всіх запитів разом
+BULK_ARGS = {"priority": PRIORITY_BULK, "max_retries": 0}
+
+SENT, FAILED, BLOCKED = "sent", "failed", "blocked"
+STATUS_LABELS = {"running": "триває", "done": "завершена", "cancelled": "зупинена"}
+
+
+class BroadcastJob:
+    FIELDS = (
+        "id", "text", "from_chat_id", "message_id", "status_chat_id", "status_message_id",
+        "status", "last_user_id", "total", "sent", "failed", "blocked",
+    )
+    __slots__ = FIELDS
+
+    def __init__(self, row):
+        for field, value in zip(self.FIELDS, row):
+            setattr(self, field, value)
+
+    @property
+    def done(self) -> int:
+        return self.sent + self.failed + self.blocked
+
+
+def _duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600} год {seconds % 3600 // 60} хв"
+    if seconds >= 60:
+        return f"{seconds // 60} хв {seconds % 60} с"
+    return f"{seconds} с"
+
+
+def format_status(job: BroadcastJob, rate: float = None) -> str:
+    total = max(job.total, job.done)
+    lines = [
+        f"📣 Розсилка #{job.id} — {STATUS_LABELS.get(job.status, job.status)}",
+        f"Надіслано: {job.sent} з {total}" + (f" ({job.done / total:.0%} оброблено)" if total else ""),
+        f"Заблокували бота: {job.blocked}, помилок: {job.failed}",
+    ]
+    if rate:
+        line = f"Швидкість: {rate:.1f} повідомл./с"
+        if job.status == "running" and total > job.done:
+            line += f", залишилось ≈ {_duration((total - job.done) / rate)}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+class Broadcaster:
+    def __init__(self, batch: int = 50, progress_interval: float = 5.0, lease: float = 30.0):
+        self.store = None
+        self.batch = batch
+        self.progress_interval = progress_interval
+        self.lease = lease
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.job = None
+        self._task = None
+        self._watch_task = None
+        self._paused_until = 0.0
+        self._stopping = False
+        # для швидкості: момент запуску в цьому процесі і скільки вже було оброблено до нього
+        self._run_started = 0.0
+        self._run_base = 0
+        self.retry_after = 0
+
+    def configure(self, batch: int, progress_interval: float, lease: float):
+        self.batch = batch
+        self.progress_interval = progress_interval
+        self.lease = lease
+
+    def open(self, store):
+        """store — SessionStore: розсилки живуть у тій самій базі, що й реєстр користувачів."""
+        self.store = store
+        store.query(
+            "CREATE TABLE IF NOT EXISTS broadcasts ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " text TEXT,"
+            " from_chat_id INTEGER,"
+            " message_id INTEGER,"
+            " status_chat_id INTEGER,"
+            " status_message_id INTEGER,"
+            " status TEXT NOT NULL,"
+            " last_user_id INTEGER NOT NULL DEFAULT 0,"
+            " total INTEGER NOT NULL DEFAULT 0,"
+            " sent INTEGER NOT NULL DEFAULT 0,"
+            " failed INTEGER NOT NULL DEFAULT 0,"
+            " blocked INTEGER NOT NULL DEFAULT 0,"
+            " owner TEXT,"
+            " heartbeat REAL NOT NULL DEFAULT 0,"
+            " created_at REAL NOT NULL,"
+            " finished_at REAL)"
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def rate(self) -> float:
+        elapsed = time.monotonic() - self._run_started
+        if not self.running or elapsed <= 0:
+            return 0.0
+        return (self.job.done - self._run_base) / elapsed
+
+    def _load(self, where: str, params=()):
+        rows = self.store.query(f"SELECT {', '.join(BroadcastJob.FIELDS)} FROM broadcasts {where}", params)
+        return BroadcastJob(rows[0]) if rows else None
+
+    def latest(self):
+        """Поточна (або остання) розсилка — з бази, тож видно і розсилку іншого воркера."""
+        if self.running:
+            return self.job
+        if self.store is None:
+            return None
+        return self._load("ORDER BY id DESC LIMIT 1")
+
+    # ===============================
+    # Керування
+    # ===============================
+    async def start(self, bot, status_message, text: str = None, source=None):
+        """
+        Почати розсилку тексту text або копії повідомлення source; status_message —
+        повідомлення, яке редагуватиметься з прогресом.
+        """
+        if self.store is None:
+            raise RuntimeError("розсилка потребує постійного сховища (SESSION_DB)")
+        now = time.time()
+        total = self.store.query("SELECT COUNT(*) FROM users WHERE blocked = 0")[0][0]
+        # перевірка і вставка одним запитом: два адміни не запустять дві розсилки одночасно
+        inserted, job_id = await self.store.execute_async(
+            "INSERT INTO broadcasts (text, from_chat_id, message_id, status_chat_id, status_message_id,"
+            " status, total, owner, heartbeat, created_at)"
+            " SELECT ?, ?, ?, ?, ?, 'running', ?, ?, ?, ?"
+            " WHERE NOT EXISTS (SELECT 1 FROM broadcasts WHERE status = 'running')",
+            (
+                text, source.chat_id if source else None, source.message_id if source else None,
+                status_message.chat_id, status_message.message_id, total, self.owner, now, now,
+            ),
+        )
+        if not inserted:
+            raise RuntimeError("попередня розсилка ще триває (/broadcast stop — зупинити)")
+        job = self._load("WHERE id = ?", (job_id,))
+        self._launch(bot, job)
+        return job
+
+    async def stop(self, bot) -> bool:
+        """Зупинити розсилку; якщо вона йде в іншому воркері, той зупиниться на наступній пачці."""
+        if self.store is None:
+            return False
+        stopped, _ = await self.store.execute_async(
+            "UPDATE broadcasts SET status = 'cancelled', finished_at = ? WHERE status = 'running'", (time.time(),)
+        )
+        if self.running:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self.job.status = "cancelled"
+            await self._save_counters(self.job)
+            await self._report(bot, self.job)
+        return bool(stopped)
+
+    def _launch(self, bot, job: BroadcastJob):
+        self.job = job
+        self._paused_until = 0.0
+        self._run_started = time.monotonic()
+        self._run_base = job.done
+        self._task = asyncio.get_running_loop().create_task(self._run(bot, job))
+
+    # ===============================
+    # Надсилання
+    # ===============================
+    async def _run(self, bot, job: BroadcastJob):
+        logger.info("Broadcast #%s: starting after user %s", job.id, job.last_user_id)
+        reporter = asyncio.get_running_loop().create_task(self._report_loop(bot, job))
+        try:
+            while not self._stopping:
+                user_ids = [row[0] for row in self.store.query(
+                    "SELECT user_id FROM users WHERE user_id > ? AND blocked = 0 ORDER BY user_id LIMIT ?",
+                    (job.last_user_id, self.batch),
+                )]
+                if not user_ids:
+                    job.status = "done"
+                    break
+                results = await asyncio.gather(*(self._deliver(bot, job, user_id) for user_id in user_ids))
+                blocked = [user_id for user_id, result in zip(user_ids, results) if result == BLOCKED]
+                if blocked:
+                    await self.store.execute_async(
+                        f"UPDATE users SET blocked = 1 WHERE user_id IN ({', '.join('?' * len(blocked))})", blocked
+                    )
+                job.last_user_id = user_ids[-1]
+                if not await self._save_counters(job, checkpoint=True):
+                    # зупинили з іншого воркера (або розсилку забрав інший процес)
+                    job.status = self._load("WHERE id = ?", (job.id,)).status
+                    break
+        except Exception:
+            # контрольна точка в базі лишається — розсилку підхопить resume_orphaned після lease
+            logger.exception("Broadcast #%s failed, will resume from user %s", job.id, job.last_user_id)
+            return
+        finally:
+            reporter.cancel()
+        if self._stopping and job.status == "running":
+            return
+        if job.status == "done":
+            await self.store.execute_async(
+                "UPDATE broadcasts SET status = 'done', finished_at = ? WHERE id = ? AND owner = ?",
+                (time.time(), job.id, self.owner),
+            )
+        logger.info("Broadcast #%s %s: sent %s, blocked %s, failed %s",
+                    job.id, job.status, job.sent, job.blocked, job.failed)
+        await self._report(bot, job)
+
+    async def _deliver(self, bot, job: BroadcastJob, user_id: int) -> str:
+        while True:
+            while (delay := self._paused_until - time.monotonic()) > 0:
+                await asyncio.sleep(delay)
+            try:
+                if job.message_id:
+                    await bot.copy_message(
+                        chat_id=user_id, from_chat_id=job.from_chat_id, message_id=job.message_id,
+                        rate_limit_args=BULK_ARGS,
+                    )
+                else:
+                    await bot.send_message(chat_id=user_id, text=job.text, rate_limit_args=BULK_ARGS)
+            except RetryAfter as e:
+                self.retry_after += 1
+                self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after + 0.1)
+                logger.info("Broadcast #%s: RetryAfter %s s, pausing", job.id, e.retry_after)
+                continue
+            except Forbidden:
+                job.blocked += 1
+                return BLOCKED
+            except TelegramError as e:
+                job.failed += 1
+                logger.info("Broadcast #%s: user %s: %s", job.id, user_id, e)
+                return FAILED
+            job.sent += 1
+            return SENT
+
+    async def _save_counters(self, job: BroadcastJob, checkpoint: bool = False) -> bool:
+        """Записати лічильники (з checkpoint — ще й останній user_id); False — розсилка вже не наша."""
+        updated, _ = await self.store.execute_async(
+            "UPDATE broadcasts SET last_user_id = ?, sent = ?, failed = ?, blocked = ?, heartbeat = ?"
+            " WHERE id = ? AND owner = ?" + (" AND status = 'running'" if checkpoint else ""),
+            (job.last_user_id, job.sent, job.failed, job.blocked, time.time(), job.id, self.owner),
+        )
+        return bool(updated)
+
+    # ===============================
+    # Прогрес
+    # ===============================
+    async def _report_loop(self, bot, job: BroadcastJob):
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            # ознака життя — навіть якщо пачка стоїть на паузі після RetryAfter
+            await self.store.execute_async(
+                "UPDATE broadcasts SET heartbeat = ? WHERE id = ? AND owner = ?", (time.time(), job.id, self.owner)
+            )
+            await self._report(bot, job)
+
+    async def _report(self, bot, job: BroadcastJob):
+        if not job.status_message_id:
+            return
+        try:
+            await bot.edit_message_text(
+                format_status(job, self.rate() or None), chat_id=job.status_chat_id, message_id=job.status_message_id,
+            )
+        except TelegramError as e:
+            logger.debug("Broadcast #%s: status edit failed: %s", job.id, e)
+
+    # ===============================
+    # Відновлення після рестарту
+    # ===============================
+    async def resume_orphaned(self, bot):
+        """Підхопити розсилку, власник якої не подавав ознак життя довше за lease."""
+        if self.running or self.store is None:
+            return None
+        now = time.time()
+        for (job_id,) in self.store.query(
+            "SELECT id FROM broadcasts WHERE status = 'running' AND heartbeat < ?", (now - self.lease,)
+        ):
+            claimed, _ = await self.store.execute_async(
+                "UPDATE broadcasts SET owner = ?, heartbeat = ? WHERE id = ? AND status = 'running' AND heartbeat < ?",
+                (self.owner, now, job_id, now - self.lease),
+            )
+            if claimed:
+                job = self._load("WHERE id = ?", (job_id,))
+                self._launch(bot, job)
+                return job
+        return None
+
+    async def _watch(self, bot, interval: float):
+        while True:
+            try:
+                await self.resume_orphaned(bot)
+            except Exception:
+                logger.exception("Не вдалося перевірити незавершені розсилки")
+            await asyncio.sleep(interval)
+
+    def start_watching(self, bot):
+        if self.store is not None and self._watch_task is None:
+            self._watch_task = asyncio.get_running_loop().create_task(self._watch(bot, self.lease / 3))
+
+    async def close(self, timeout: float = 5.0):
+        """
+        Зупинка бота: даємо дослати поточну пачку (не довше timeout), розсилка лишається
+        незавершеною, і наступний процес підхопить її одразу, без очікування lease.
+        """
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._watch_task
+            self._watch_task = None
+        if self.running:
+            self._stopping = True
+            try:
+                await asyncio.wait_for(self._task, timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                pass
+            # лічильники в базі лишаються на контрольній точці: незавершену пачку надішлемо ще раз
+            await self.store.execute_async(
+                "UPDATE broadcasts SET heartbeat = 0 WHERE id = ? AND owner = ?", (self.job.id, self.owner)
+            )
+            logger.info("Broadcast #%s paused for shutdown after user %s", self.job.id, self.job.last_user_id)
+
+    def stats(self):
+        job = self.job
+        return {
+            "running": int(self.running),
+            "sent": job.sent if job else 0,
+            "failed": job.failed if job else 0,
+            "blocked": job.blocked if job else 0,
+            "rate": self.rate(),
+            "retry_after": self.retry_after,
+        }
+
+
+broadcaster = Broadcaster()
@@ -0,0 +1,214 @@
+# core/metrics.py
+"""
+Мінімальний реєстр метрик у текстовому форматі Prometheus (без зовнішніх залежностей).
+
+- Counter і Histogram оновлюються в гарячому шляху: один dict-доступ і кілька додавань,
+  гістограма шукає кошик через bisect;
+- gauge-и й лічильники з наявних stats() (черга, кеші, сесії, ліміти) обчислюються лише
+  під час запиту /metrics — register_stats(prefix, stats_fn) експортує всі числові поля.
+
+collect() повертає прості кортежі (їх можна передати між процесами), render() — текст
+для Prometheus; у режимі воркерів фронт об'єднує зібране з усіх воркерів з міткою worker.
+"""
+
+import bisect
+import functools
+import logging
+import time
+
+from core import tracing
+
+logger = logging.getLogger(__name__)
+
+# Межі кошиків гістограм затримок, секунди
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _escape_help(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}  # tuple значень міток -> число
+
+    def inc(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def collect(self):
+        samples = [
+            (self.name, tuple(zip(self.labelnames, labels)), value)
+            for labels, value in self._values.items()
+        ]
+        return self.name, "counter", self.help, samples
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # tuple значень міток -> [лічильники кошиків (не кумулятивні), сума, кількість]
+
+    def observe(self, value: float, *labels):
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def summary(self):
+        """{мітки: (кількість, сума, оцінка p95)} — для /stats; p95 — верхня межа кошика."""
+        result = {}
+        for labels, (counts, total, count) in self._values.items():
+            threshold = count * 0.95
+            running = 0
+            p95 = float("inf")
+            for bound, n in zip(self.buckets, counts):
+                running += n
+                if running >= threshold:
+                    p95 = bound
+                    break
+            result[labels] = (count, total, p95)
+        return result
+
+    def collect(self):
+        samples = []
+        for labels, (counts, total, count) in self._values.items():
+            base = tuple(zip(self.labelnames, labels))
+            running = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                running += n
+                samples.append((self.name + "_bucket", base + (("le", _format_value(float(bound))),), running))
+            samples.append((self.name + "_sum", base, total))
+            samples.append((self.name + "_count", base, count))
+        return self.name, "histogram", self.help, samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name: str, help: str, labelnames=()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_stats(self, prefix: str, stats_fn, help: str = "", counters=()):
+        """
+        Кожне числове поле stats_fn() стає gauge-ем <prefix>_<поле>; поля з counters
+        (лічильники, що лише ростуть) — counter-ами <prefix>_<поле>_total, щоб до них
+        можна було застосувати rate().
+        """
+        counters = frozenset(counters)
+
+        def collect():
+            families = []
+            for field, value in stats_fn().items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                description = f"{help} ({field})" if help else field
+                if field in counters:
+                    name = f"{prefix}_{field}_total"
+                    families.append((name, "counter", description, [(name, (), value)]))
+                else:
+                    name = f"{prefix}_{field}"
+                    families.append((name, "gauge", description, [(name, (), value)]))
+            return families
+
+        self._collectors.append(collect)
+
+    def collect(self):
+        """Список родин метрик: (name, type, help, [(sample_name, ((мітка, значення), ...), value)])."""
+        families = [metric.collect() for metric in self._metrics]
+        for collector in self._collectors:
+            try:
+                families.extend(collector())
+            except Exception:
+                logger.exception("Metrics collector failed")
+        return families
+
+    def render(self, extra=()):
+        """
+        Текст для /metrics. extra — пари (мітки, families) з інших процесів:
+        їхні семпли отримують ці мітки і зливаються з власними в одну родину.
+        """
+        return render([((), self.collect()), *extra])
+
+
+def render(sources) -> str:
+    merged = {}  # name -> [type, help, samples]
+    for extra_labels, families in sources:
+        for name, kind, help, samples in families:
+            family = merged.setdefault(name, [kind, help, []])
+            family[2].extend(
+                (sample_name, tuple(extra_labels) + tuple(labels), value)
+                for sample_name, labels, value in samples
+            )
+    lines = []
+    for name, (kind, help, samples) in merged.items():
+        if not samples:
+            continue
+        lines.append(f"# HELP {name} {_escape_help(help)}")
+        lines.append(f"# TYPE {name} {kind}")
+        for sample_name, labels, value in samples:
+            lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# Спільний реєстр процесу
+registry = Registry()
+
+# Час обробки оновлень хендлерами: handler — menu / career / start, kind — гілка відповіді
+HANDLER_SECONDS = registry.histogram(
+    "bot_handler_seconds", "Handler latency by handler and response kind", ("handler", "kind")
+)
+
+
+def timed(handler: str, kind: str, callback):
+    """Обгортка хендлера PTB: час — у bot_handler_seconds і спан трасування."""
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        started = time.perf_counter()
+        try:
+            return await callback(update, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            HANDLER_SECONDS.observe(elapsed, handler, kind)
+            tracing.record(f"{handler}:{kind}", elapsed)
+
+    return wrapper
@@ -0,0 +1,252 @@
+# core/photo_cache.py
+"""
+Кеш Telegram file_id для картинок меню.
+
+Перше надсилання картинки йде за URL (Telegram сам її завантажує), а з відповіді
+беремо file_id найбільшого PhotoSize. Далі та сама картинка надсилається за file_id,
+без повторного завантаження. Кеш зберігається на диску (STATE_DIR) і переживає рестарт.
+
+У режимі кількох воркерів файл спільний: перед записом процес зливає свій кеш з тим,
+що вже на диску (під flock), тож file_id інших воркерів не затираються, а заодно
+підхоплюються.
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+from telegram import InputMediaPhoto
+from telegram.error import BadRequest
+
+from config import PHOTO_CACHE_FILE
+
+try:
+    import fcntl
+except ImportError:  # Windows: локальний запуск в один процес, блокування не потрібне
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Telegram приймає в одному sendMediaGroup від 2 до 10 елементів
+MEDIA_GROUP_LIMIT = 10
+# Фрагменти тексту BadRequest, коли проблема саме в file_id («Wrong file identifier/HTTP URL
+# specified», «wrong remote file identifier specified: ...», «FILE_REFERENCE_EXPIRED»; в альбомі —
+# «failed to send message #N with the error message "..."»)
+STALE_FILE_ID_ERRORS = ("file identifier", "file_id", "file reference", "file_reference")
+
+
+def is_stale_file_id(error: BadRequest) -> bool:
+    message = error.message.lower()
+    return any(fragment in message for fragment in STALE_FILE_ID_ERRORS)
+
+
+class PhotoCache:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._ids = {}  # URL -> file_id
+        # зміни з останнього save(): нові file_id і викинуті після BadRequest (URL -> file_id)
+        self._learned = {}
+        self._stale = {}
+        self.hits = 0
+        self.misses = 0
+        # кількість та сумарний час надсилань: з кешу / за URL
+        self._sends = {"cached": [0, 0.0], "uncached": [0, 0.0]}
+        self._warm_task = None
+        self.load()
+
+    # ===============================
+    # Диск
+    # ===============================
+    def _read(self) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError):
+            logger.warning("Не вдалося прочитати кеш file_id %s", self.path)
+            return {}
+        return {str(k): str(v) for k, v in data.items()} if isinstance(data, dict) else {}
+
+    def load(self):
+        self._ids = self._read()
+
+    @contextlib.contextmanager
+    def _locked(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self.path.with_suffix(f"{self.path.suffix}.lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._locked():
+            # у режимі кількох воркерів файл пишуть усі: за основу — те, що на диску,
+            # і поверх лише власні зміни з останнього запису
+            merged = {
+                url: file_id for url, file_id in self._read().items() if self._stale.get(url) != file_id
+            }
+            merged.update(self._learned)
+            tmp = self.path.with_suffix(f"{self.path.suffix}.{os.getpid()}.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(merged, f, ensure_ascii=False, indent=1)
+            os.replace(tmp, self.path)
+        self._ids = merged
+        self._learned.clear()
+        self._stale.clear()
+
+    # ===============================
+    # Кеш
+    # ===============================
+    def get(self, url: str):
+        return self._ids.get(url)
+
+    def remember(self, url: str, message):
+        """Запам'ятати file_id з повідомлення, щойно надісланого за URL."""
+        photo = getattr(message, "photo", None)
+        if not photo:
+            return
+        file_id = photo[-1].file_id  # найбільший розмір
+        if self._ids.get(url) != file_id:
+            self._ids[url] = self._learned[url] = file_id
+            self._stale.pop(url, None)
+            try:
+                self.save()
+            except OSError:
+                logger.exception("Не вдалося зберегти кеш file_id")
+
+    def forget(self, url: str):
+        file_id = self._ids.pop(url, None)
+        if file_id is not None:
+            self._stale[url] = file_id
+            self._learned.pop(url, None)
+            try:
+                self.save()
+            except OSError:
+                logger.exception("Не вдалося зберегти кеш file_id")
+
+    def _record(self, kind: str, started: float):
+        entry = self._sends[kind]
+        entry[0] += 1
+        entry[1] += time.perf_counter() - started
+
+    # ===============================
+    # Надсилання
+    # ===============================
+    async def send(self, message, url: str):
+        """reply_photo через кеш: file_id, якщо відомий, інакше URL з подальшим запам'ятовуванням."""
+        file_id = self._ids.get(url)
+        if file_id:
+            self.hits += 1
+            started = time.perf_counter()
+            try:
+                msg = await message.reply_photo(photo=file_id)
+            except BadRequest as e:
+                # решта помилок (текст, чат, права) за URL теж не пройде — їх не ковтаємо
+                if not is_stale_file_id(e):
+                    raise
+                # file_id більше не дійсний — відправимо за URL і збережемо новий
+                logger.warning("Застарілий file_id для %s: %s", url, e.message)
+                self.forget(url)
+            else:
+                self._record("cached", started)
+                return msg
+        else:
+            self.misses += 1
+        started = time.perf_counter()
+        msg = await message.reply_photo(photo=url)
+        self._record("uncached", started)
+        self.remember(url, msg)
+        return msg
+
+    async def send_group(self, message, urls):
+        """
+        Надіслати кілька картинок альбомами (sendMediaGroup) по MEDIA_GROUP_LIMIT штук.
+        Повертає всі надіслані повідомлення.
+        """
+        messages = []
+        for i in range(0, len(urls), MEDIA_GROUP_LIMIT):
+            chunk = urls[i:i + MEDIA_GROUP_LIMIT]
+            if len(chunk) == 1:
+                messages.append(await self.send(message, chunk[0]))
+            else:
+                messages.extend(await self._send_chunk(message, chunk))
+        return messages
+
+    async def _send_chunk(self, message, urls):
+        file_ids = [self._ids.get(url) for url in urls]
+        cached = all(file_ids)
+        if cached:
+            self.hits += len(urls)
+        else:
+            self.hits += sum(1 for f in file_ids if f)
+            self.misses += sum(1 for f in file_ids if not f)
+        started = time.perf_counter()
+        try:
+            sent = await message.reply_media_group(
+                media=[InputMediaPhoto(media=f or url) for f, url in zip(file_ids, urls)]
+            )
+        except BadRequest as e:
+            if not any(file_ids) or not is_stale_file_id(e):
+                raise
+            # якийсь із file_id застарів — надсилаємо весь альбом за URL
+            logger.warning("Застарілі file_id в альбомі, повторюємо за URL: %s", e.message)
+            for url in urls:
+                self.forget(url)
+            file_ids = [None] * len(urls)
+            cached = False
+            started = time.perf_counter()
+            sent = await message.reply_media_group(media=[InputMediaPhoto(media=url) for url in urls])
+        self._record("cached" if cached else "uncached", started)
+        for file_id, url, msg in zip(file_ids, urls, sent):
+            if not file_id:
+                self.remember(url, msg)
+        return list(sent)
+
+    async def warm(self, bot, chat_id, urls):
+        """Прогріти кеш: надіслати в службовий чат усі ще невідомі картинки і одразу видалити."""
+        for url in urls:
+            if url in self._ids:
+                continue
+            try:
+                msg = await bot.send_photo(chat_id=chat_id, photo=url)
+            except Exception:
+                logger.warning("Не вдалося прогріти картинку %s", url, exc_info=True)
+                continue
+            self.remember(url, msg)
+            try:
+                await bot.delete_message(chat_id=chat_id, message_id=msg.message_id)
+            except Exception:
+                pass
+
+    def start_warmup(self, bot, chat_id, urls):
+        """Запустити warm() фоновою задачею, не затримуючи старт бота."""
+        if self._warm_task is None or self._warm_task.done():
+            self._warm_task = asyncio.get_running_loop().create_task(self.warm(bot, chat_id, list(urls)))
+
+    def stats(self):
+        total = self.hits + self.misses
+        cached_n, cached_t = self._sends["cached"]
+        uncached_n, uncached_t = self._sends["uncached"]
+        return {
+            "size": len(self._ids),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "cached_sends": cached_n,
+            "cached_avg_ms": cached_t / cached_n * 1000 if cached_n else 0.0,
+            "uncached_sends": uncached_n,
+            "uncached_avg_ms": uncached_t / uncached_n * 1000 if uncached_n else 0.0,
+        }
+
+
+photo_cache = PhotoCache(PHOTO_CACHE_FILE)
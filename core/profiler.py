@@ -0,0 +1,94 @@
+# core/profiler.py
+"""
+Семплюючий профайлер на вимогу (/profile N в адмінці).
+
+Окремий потік кожні кілька мс знімає стек потоку event loop через sys._current_frames()
+і рахує функції: «власний» час — функція на вершині стеку, «включний» — функція
+будь-де в стеку. Поки профайлер не запущено, він нічого не коштує; під час роботи
+event loop не зупиняється і продовжує обробляти оновлення.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# Функції, в яких event loop чекає на події — це простій, а не робота
+IDLE_FUNCTIONS = frozenset({"select", "poll", "epoll", "kqueue"})
+MAX_SECONDS = 60
+
+
+def _frame_key(code) -> str:
+    path = code.co_filename.replace("\\", "/")
+    short = "/".join(path.rsplit("/", 2)[-2:]) if "/" in path else path
+    return f"{code.co_name} ({short}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def run(self, seconds: float, thread_id: int) -> dict:
+        """Блокуючий збір семплів потоку thread_id протягом seconds секунд."""
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("профайлер уже працює")
+        try:
+            own, inclusive = Counter(), Counter()
+            samples = idle = 0
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                frame = sys._current_frames().get(thread_id)
+                if frame is None:
+                    break
+                samples += 1
+                if frame.f_code.co_name in IDLE_FUNCTIONS:
+                    idle += 1
+                else:
+                    own[_frame_key(frame.f_code)] += 1
+                    seen = set()
+                    while frame is not None:
+                        key = _frame_key(frame.f_code)
+                        # кадри самого asyncio є в кожному стеку — лише шум у зведенні
+                        if key not in seen and "asyncio/" not in key:
+                            seen.add(key)
+                            inclusive[key] += 1
+                        frame = frame.f_back
+                del frame
+                time.sleep(self.interval)
+            return {"seconds": seconds, "samples": samples, "idle": idle, "own": own, "inclusive": inclusive}
+        finally:
+            self._lock.release()
+
+    async def profile(self, seconds: float) -> dict:
+        """Профілювати потік поточного event loop, не блокуючи його."""
+        seconds = max(1.0, min(float(seconds), MAX_SECONDS))
+        return await asyncio.to_thread(self.run, seconds, threading.get_ident())
+
+
+def format_profile(result: dict, top: int = 12) -> str:
+    samples = result["samples"]
+    if not samples:
+        return "Жодного семплу."
+    busy = samples - result["idle"]
+    lines = [
+        f"{result['seconds']:.0f} с, {samples} семплів, pid {os.getpid()}",
+        f"Зайнятість event loop: {busy / samples:.0%}",
+    ]
+    for title, counter in (("Власний час", result["own"]), ("Включний час", result["inclusive"])):
+        if not counter:
+            continue
+        lines.append("")
+        lines.append(f"{title}:")
+        for key, count in counter.most_common(top):
+            lines.append(f"{count / samples:6.1%}  {key}")
+    return "\n".join(lines)
+
+
+profiler = SamplingProfiler()
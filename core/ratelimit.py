@@ -0,0 +1,275 @@
+# core/ratelimit.py
+"""
+Обмеження частоти вихідних запитів до Bot API (token bucket) з повтором після RetryAfter.
+
+Підключається до ApplicationBuilder().rate_limiter(...) і бачить кожен запит бота:
+- глобальний bucket (~30 повідомлень/с на бота) з пріоритетами: редагування й відповіді
+  користувачу проходять раніше, ніж фонові видалення;
+- окремий bucket на кожен приватний чат і на кожну групу/канал — для запитів, що
+  надсилають нові повідомлення (send*, copy*, forward*); редагування й видалення
+  обмежуються лише глобально;
+- RetryAfter від Telegram — пауза на вказаний сервером час і повтор запиту.
+Запити без chat_id (answerCallbackQuery, getMe, setWebhook...) не обмежуються.
+"""
+
+import asyncio
+import contextlib
+import heapq
+import itertools
+import logging
+import time
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from core import tracing
+from core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+API_REQUESTS = registry.counter(
+    "bot_api_requests_total", "Bot API calls by method and result (ok, retry_after or error class)",
+    ("method", "result"),
+)
+API_SECONDS = registry.histogram("bot_api_request_seconds", "Bot API call latency by method", ("method",))
+API_WAIT_SECONDS = registry.histogram("bot_api_rate_limit_wait_seconds", "Time spent waiting for rate limit tokens")
+
+
+def _observe(endpoint: str, result: str, queued: float, started: float):
+    """Метрики і спан трасування одного виклику: queued — перед лімітером, started — перед запитом."""
+    now = time.monotonic()
+    API_SECONDS.observe(now - started, endpoint)
+    API_REQUESTS.inc(endpoint, result)
+    tracing.record(endpoint, now - queued, started - queued)
+
+# Менше число — вищий пріоритет у глобальній черзі
+PRIORITY_INTERACTIVE = 0
+PRIORITY_MEDIA = 1
+PRIORITY_CLEANUP = 2
+PRIORITY_BULK = 3
+
+ENDPOINT_PRIORITY = {
+    "editMessageText": PRIORITY_INTERACTIVE,
+    "editMessageReplyMarkup": PRIORITY_INTERACTIVE,
+    "sendMessage": PRIORITY_INTERACTIVE,
+    "sendPhoto": PRIORITY_MEDIA,
+    "sendMediaGroup": PRIORITY_MEDIA,
+    "deleteMessage": PRIORITY_CLEANUP,
+    "deleteMessages": PRIORITY_CLEANUP,
+}
+
+# Запити, на які діють ліміти Telegram «повідомлень на чат»
+CHAT_LIMITED_PREFIXES = ("send", "copy", "forward")
+
+# Скільки bucket-ів чатів тримати, перш ніж прибирати простоюючі
+MAX_IDLE_BUCKETS = 1024
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "stamp", "blocked_until")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.stamp = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def reserve(self, now: float) -> float:
+        """Взяти токен, якщо він є (повертає 0), інакше — скільки секунд почекати."""
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def block(self, seconds: float):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def is_idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity and now >= self.blocked_until
+
+
+class BotRateLimiter(BaseRateLimiter):
+    """
+    rate_limit_args (опційно, через параметр rate_limit_args методів бота) — dict з ключами
+    "priority" та/або "max_retries", напр. {"priority": PRIORITY_BULK} для розсилок.
+    """
+
+    def __init__(
+        self,
+        overall_rate: float = 30,
+        chat_rate: float = 1,
+        chat_burst: float = 5,
+        group_rate: float = 20 / 60,
+        group_burst: float = 20,
+        max_retries: int = 3,
+    ):
+        self._overall = TokenBucket(overall_rate, overall_rate) if overall_rate > 0 else None
+        self._chat_rate = chat_rate
+        self._chat_burst = chat_burst
+        self._group_rate = group_rate
+        self._group_burst = group_burst
+        self._max_retries = max_retries
+        self._buckets = {}           # chat_id -> TokenBucket
+        self._waiters = []           # heap: (priority, seq, future)
+        self._seq = itertools.count()
+        self._dispatcher = None
+        # метрики
+        self.requests = 0
+        self.limited = 0             # запитів, що пройшли через bucket-и
+        self.waiting = 0             # запитів, що зараз чекають на токен
+        self.max_waiting = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.retries = 0
+        self.failed_retries = 0
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._dispatcher
+            self._dispatcher = None
+
+    # ===============================
+    # Bucket-и
+    # ===============================
+    def _chat_bucket(self, chat_id):
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            if len(self._buckets) > MAX_IDLE_BUCKETS:
+                now = time.monotonic()
+                for key in [k for k, b in self._buckets.items() if b.is_idle(now)]:
+                    del self._buckets[key]
+            is_group = isinstance(chat_id, str) or chat_id < 0
+            if is_group:
+                if self._group_rate <= 0:
+                    return None
+                bucket = TokenBucket(self._group_rate, self._group_burst)
+            else:
+                if self._chat_rate <= 0:
+                    return None
+                bucket = TokenBucket(self._chat_rate, self._chat_burst)
+            self._buckets[chat_id] = bucket
+        return bucket
+
+    @staticmethod
+    async def _take(bucket: TokenBucket):
+        while (delay := bucket.reserve(time.monotonic())) > 0:
+            await asyncio.sleep(delay)
+
+    async def _take_overall(self, priority: int):
+        # швидкий шлях: черга порожня і токен є
+        if not self._waiters and self._overall.reserve(time.monotonic()) == 0:
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.get_running_loop().create_task(self._dispatch())
+        await future
+
+    async def _dispatch(self):
+        """Роздає глобальні токени чекаючим у порядку пріоритету."""
+        while self._waiters:
+            _, _, future = self._waiters[0]
+            if future.done():  # запит скасували, поки він чекав
+                heapq.heappop(self._waiters)
+                continue
+            delay = self._overall.reserve(time.monotonic())
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            heapq.heappop(self._waiters)
+            future.set_result(None)
+
+    async def _acquire(self, bucket, priority: int):
+        if bucket is None and self._overall is None:
+            return
+        started = time.monotonic()
+        self.limited += 1
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            if bucket is not None:
+                await self._take(bucket)
+            if self._overall is not None:
+                await self._take_overall(priority)
+        finally:
+            self.waiting -= 1
+            waited = time.monotonic() - started
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            API_WAIT_SECONDS.observe(waited)
+
+    # ===============================
+    # Точка входу PTB
+    # ===============================
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        options = rate_limit_args if isinstance(rate_limit_args, dict) else {}
+        priority = options.get("priority", ENDPOINT_PRIORITY.get(endpoint, PRIORITY_MEDIA))
+        max_retries = options.get("max_retries", self._max_retries)
+        self.requests += 1
+
+        chat_id = data.get("chat_id")
+        with contextlib.suppress(ValueError, TypeError):
+            chat_id = int(chat_id)
+        limited = chat_id is not None
+        bucket = None
+        if limited and endpoint.startswith(CHAT_LIMITED_PREFIXES):
+            bucket = self._chat_bucket(chat_id)
+
+        for attempt in range(max_retries + 1):
+            queued = time.monotonic()
+            if limited:
+                await self._acquire(bucket, priority)
+            started = time.monotonic()
+            try:
+                result = await callback(*args, **kwargs)
+            except RetryAfter as exc:
+                _observe(endpoint, "retry_after", queued, started)
+                if attempt == max_retries:
+                    # max_retries=0 — викликач (напр. розсилка) обробляє RetryAfter сам
+                    if max_retries:
+                        self.failed_retries += 1
+                        logger.warning("%s: RetryAfter після %d повторів, здаємося", endpoint, max_retries)
+                    raise
+                self.retries += 1
+                delay = exc.retry_after + 0.1
+                logger.info("%s: RetryAfter %.1f с (chat %s), повтор %d", endpoint, delay, chat_id, attempt + 1)
+                if bucket is not None:
+                    # решта запитів цього чату теж почекає — сервер однаково їх відхилить
+                    bucket.block(delay)
+                else:
+                    await asyncio.sleep(delay)
+            except Exception as exc:
+                _observe(endpoint, type(exc).__name__, queued, started)
+                raise
+            else:
+                _observe(endpoint, "ok", queued, started)
+                return result
+        return None
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "limited": self.limited,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "queued_overall": len(self._waiters),
+            "avg_wait_ms": self.wait_total / self.limited * 1000 if self.limited else 0.0,
+            "max_wait_ms": self.wait_max * 1000,
+            "retries": self.retries,
+            "failed_retries": self.failed_retries,
+            "chat_buckets": len(self._buckets),
+        }
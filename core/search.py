@@ -0,0 +1,166 @@
+# core/search.py
+"""
+Інвертований індекс для пошуку по меню: назви вузлів з menu.json і тексти відповідей з info.json.
+
+Нормалізація під українську: casefold, різні апострофи (', ’, ʼ, `) прибираються,
+ґ -> г, прибираються типові закінчення (кафедра / кафедри / кафедрою -> «кафедр»).
+Слова запиту шукаються як префікси: словник основ відсортований, тож усі основи з
+потрібним префіксом — це один bisect і короткий прохід вперед.
+
+Після старту індекс будується при першому пошуку (кілька мс на реальних даних),
+при /reload — разом з новим знімком, поза event loop. При перезавантаженні
+наново токенізуються лише документи, текст яких змінився; решта береться з
+попереднього індексу.
+"""
+
+import bisect
+import functools
+import re
+from typing import NamedTuple
+
+APOSTROPHES = "'’ʼ`‘′"
+# str.translate зі словником посимвольно звертається до dict; кілька replace() у рази швидші
+_REPLACEMENTS = tuple((c, "") for c in APOSTROPHES) + (("ґ", "г"), ("ё", "е"), ("ъ", ""))
+_TOKEN_RE = re.compile(r"[^\W_]+")
+# Закінчення; відрізається найдовше, основа має лишитися щонайменше з MIN_STEM літер
+ENDINGS = frozenset({
+    "ами", "ями", "ові", "еві", "ого", "ому", "ими", "іми", "ій", "ий", "ої", "ою", "ею", "єю",
+    "ів", "їв", "ах", "ях", "ам", "ям", "ом", "ем", "им", "их", "ія", "ії", "ію",
+    "а", "я", "і", "и", "у", "ю", "е", "о", "ь", "ї", "є",
+})
+_ENDING_LENGTHS = sorted({len(e) for e in ENDINGS}, reverse=True)
+MIN_STEM = 3
+# Скільки різних основ може покрити один префікс запиту
+MAX_EXPANSIONS = 64
+TITLE_WEIGHT = 3.0
+BODY_WEIGHT = 1.0
+CONTEXT_WEIGHT = 0.5
+PREFIX_FACTOR = 0.6
+
+
+def normalize(text: str) -> str:
+    text = text.casefold()
+    for old, new in _REPLACEMENTS:
+        if old in text:
+            text = text.replace(old, new)
+    return text
+
+
+@functools.lru_cache(maxsize=65536)
+def stem(token: str) -> str:
+    if len(token) > MIN_STEM + 1:
+        for n in _ENDING_LENGTHS:
+            if len(token) - n >= MIN_STEM and token[-n:] in ENDINGS:
+                return token[:-n]
+    return token
+
+
+def tokenize(text: str) -> tuple:
+    """Основи слів тексту в порядку появи (з повторами)."""
+    return tuple(stem(t) for t in _TOKEN_RE.findall(normalize(text)))
+
+
+class Document(NamedTuple):
+    key: tuple        # шлях вузла меню
+    title: str
+    body: str
+    context: str = ""  # назви батьківських розділів: «контакти філологічного»
+
+
+class SearchResult(NamedTuple):
+    key: tuple
+    title: str
+    snippet: str
+    score: float
+
+
+class SearchIndex:
+    def __init__(self, documents, previous: "SearchIndex" = None):
+        self.documents = list(documents)
+        # текст -> основи; з попереднього індексу беремо вже пораховане
+        cache = previous._tokens if previous is not None else {}
+        self._tokens = {}
+        self.reused = 0
+        postings = {}  # основа -> {номер документа: вага}
+        for doc_id, doc in enumerate(self.documents):
+            for text, weight in ((doc.title, TITLE_WEIGHT), (doc.body, BODY_WEIGHT), (doc.context, CONTEXT_WEIGHT)):
+                if not text:
+                    continue
+                tokens = cache.get(text)
+                if tokens is None:
+                    tokens = tokenize(text)
+                else:
+                    self.reused += 1
+                self._tokens[text] = tokens
+                for token in set(tokens):
+                    entry = postings.setdefault(token, {})
+                    entry[doc_id] = entry.get(doc_id, 0.0) + weight
+        self._postings = postings
+        self._vocabulary = sorted(postings)
+        # doc_id -> (текст для уривка, він же в нижньому регістрі); заповнюється при пошуку
+        self._plain = {}
+
+    def __len__(self):
+        return len(self.documents)
+
+    def _expand(self, term: str):
+        """Основи індексу, що починаються з term: (основа, множник ваги)."""
+        vocabulary = self._vocabulary
+        i = bisect.bisect_left(vocabulary, term)
+        end = min(len(vocabulary), i + MAX_EXPANSIONS)
+        while i < end and vocabulary[i].startswith(term):
+            yield vocabulary[i], 1.0 if vocabulary[i] == term else PREFIX_FACTOR
+            i += 1
+
+    def search(self, query: str, limit: int = 10):
+        """Документи, що містять усі слова запиту (префіксом), за спаданням релевантності."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        scores = None
+        for term in terms:
+            term_scores = {}
+            for token, factor in self._expand(term):
+                for doc_id, weight in self._postings[token].items():
+                    score = weight * factor
+                    if score > term_scores.get(doc_id, 0.0):
+                        term_scores[doc_id] = score
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {d: s + term_scores[d] for d, s in scores.items() if d in term_scores}
+            if not scores:
+                return []
+        # коротші назви при рівному рахунку — ймовірніше саме той розділ
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], len(self.documents[item[0]].title)))
+        return [self._result(doc_id, score, terms) for doc_id, score in ranked[:limit]]
+
+    def _result(self, doc_id: int, score: float, terms) -> SearchResult:
+        doc = self.documents[doc_id]
+        plain = self._plain.get(doc_id)
+        if plain is None:
+            text = " ".join(doc.body.replace("*", "").split())
+            # відповідь-стаття починається з власного заголовка — в уривку він зайвий
+            if doc.title and text.startswith(doc.title):
+                text = text[len(doc.title):].lstrip()
+            # lower() не змінює довжину кириличного тексту — позиції збігаються з text
+            plain = self._plain[doc_id] = (text, text.lower().replace("ґ", "г"))
+        return SearchResult(doc.key, doc.title, snippet(*plain, terms), score)
+
+
+def snippet(text: str, lowered: str, terms, width: int = 90) -> str:
+    """Уривок тексту навколо першого збігу основи (або початок тексту)."""
+    if not text:
+        return ""
+    start = 0
+    for term in terms:
+        pos = lowered.find(term)
+        if pos >= 0:
+            start = max(0, pos - width // 3)
+            break
+    fragment = text[start:start + width]
+    if start > 0:
+        fragment = "…" + fragment
+    if start + width < len(text):
+        fragment += "…"
+    return fragment
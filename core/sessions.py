@@ -0,0 +1,398 @@
+# core/sessions.py
+"""
+Сесії користувачів (те, що хендлери бачать як context.user_data) з постійним сховищем.
+
+- Сховище — вбудований SQLite у режимі WAL (файл у STATE_DIR), без зовнішніх сервісів.
+- Сесія підвантажується з диска ліниво, при першому зверненні до user_data цього
+  користувача, тож старт бота не залежить від кількості користувачів.
+- Запис відкладений (write-behind): змінені сесії раз на flush_interval секунд
+  записуються однією транзакцією в окремому потоці, а не на кожному оновленні.
+- У пам'яті тримаються лише активні сесії (не більше max_active штук, не старші за ttl);
+  решта витісняється і за потреби знову читається з диска (або з пам'яті, якщо її
+  ще не встигли записати). max_active обмежує кількість
+  сесій, а не їхній розмір у байтах.
+
+Тут же реєстр користувачів (таблиця users) — хто писав боту в приватний чат; потрібен
+для розсилок (core/broadcast.py). На кожне оновлення — лише запис у dict, у базу
+реєстр потрапляє разом із сесіями, тією ж транзакцією.
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from telegram.ext import CallbackContext
+
+logger = logging.getLogger(__name__)
+
+
+class Session(MutableMapping):
+    """
+    Компактна сесія: відомі ключі user_data (див. handlers/menu.py) лежать у слотах,
+    а не в окремому dict на кожного користувача. Невідомі ключі — у ледачому _extra.
+    Значення None рівнозначне відсутності ключа.
+    """
+
+    FIELDS = ("image_message_ids", "image_chat_id", "career_progress", "career_scores")
+    __slots__ = FIELDS + ("_extra", "last_seen")
+
+    def __init__(self, data=None):
+        for field in self.FIELDS:
+            setattr(self, field, None)
+        self._extra = None
+        self.last_seen = time.monotonic()
+        if data:
+            self.update(data)
+
+    def __getitem__(self, key):
+        if key in _SESSION_FIELDS:
+            value = getattr(self, key)
+        else:
+            value = self._extra.get(key) if self._extra else None
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if key == "image_message_ids" and value is not None:
+            value = tuple(value)
+        if key in _SESSION_FIELDS:
+            setattr(self, key, value)
+        elif value is None:
+            self.pop(key, None)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in _SESSION_FIELDS:
+            if getattr(self, key) is None:
+                raise KeyError(key)
+            setattr(self, key, None)
+        elif self._extra and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self):
+        for field in self.FIELDS:
+            if getattr(self, field) is not None:
+                yield field
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def to_dict(self):
+        return {key: list(value) if isinstance(value, tuple) else value for key, value in self.items()}
+
+    def __repr__(self):
+        return f"Session({self.to_dict()!r})"
+
+
+_SESSION_FIELDS = frozenset(Session.FIELDS)
+
+
+class SessionStore:
+    """SQLite-сховище сесій: читання — з потоку event loop, запис — в окремому потоці."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._reader = self._connect()
+        self._reader.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " user_id INTEGER PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        # blocked = 1 — користувач заблокував бота (виставляє розсилка, скидає його наступне оновлення)
+        self._reader.execute(
+            "CREATE TABLE IF NOT EXISTS users ("
+            " user_id INTEGER PRIMARY KEY,"
+            " first_seen REAL NOT NULL,"
+            " last_seen REAL NOT NULL,"
+            " blocked INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._writer = self._connect()
+        # один потік запису: WAL дозволяє читати паралельно з ним
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-writer")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def load(self, user_id: int):
+        row = self._reader.execute(
+            "SELECT data FROM sessions WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def query(self, sql: str, params=()):
+        return self._reader.execute(sql, params).fetchall()
+
+    def save_many(self, rows, users=()):
+        """rows: [(user_id, json-рядок)], users: [(user_id, час)]. Виконується в потоці запису."""
+        now = time.time()
+        with self._writer:
+            self._writer.execute("BEGIN")
+            self._writer.executemany(
+                "INSERT INTO sessions (user_id, data, updated_at) VALUES (?, ?, ?)"
+                " ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                [(user_id, data, now) for user_id, data in rows],
+            )
+            self._writer.executemany(
+                "INSERT INTO users (user_id, first_seen, last_seen) VALUES (?, ?, ?)"
+                " ON CONFLICT(user_id) DO UPDATE SET last_seen = excluded.last_seen, blocked = 0",
+                [(user_id, seen, seen) for user_id, seen in users],
+            )
+
+    async def save_many_async(self, rows, users=()):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self.save_many, rows, users)
+
+    def _execute(self, sql: str, params):
+        with self._writer:
+            cursor = self._writer.execute(sql, params)
+            return cursor.rowcount, cursor.lastrowid
+
+    async def execute_async(self, sql: str, params=()):
+        """Один запис у потоці запису; (rowcount, lastrowid)."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._execute, sql, params)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self._writer.close()
+        self._reader.close()
+
+
+class SessionManager:
+    def __init__(self, max_active: int = 0, ttl: float = 0):
+        self.store = None
+        self.max_active = max_active  # кількість сесій; 0 — без обмеження
+        self.ttl = ttl                # 0 — без обмеження
+        self._sessions = OrderedDict()  # user_id -> Session, від найдавніших до найсвіжіших
+        self._dirty = set()
+        self._saved = {}      # user_id -> останній записаний JSON (щоб не писати незмінене)
+        self._evicted = {}    # user_id -> JSON витіснених, ще не записаних сесій
+        self._flushing = {}   # user_id -> JSON, що саме пишеться в SQLite (ще не закомічено)
+        self._seen = {}       # user_id -> час останнього оновлення, ще не записані в users
+        self._flush_task = None
+        self.hits = 0
+        self.loads = 0
+        self.flushes = 0
+        self.written = 0
+        self.evicted_lru = 0
+        self.evicted_ttl = 0
+        self.lost = 0         # витіснені зміни без постійного сховища
+
+    def open(self, path):
+        """Підключити постійне сховище; без нього сесії живуть лише в пам'яті."""
+        if path:
+            self.store = SessionStore(path)
+
+    def configure(self, max_active: int, ttl: float):
+        self.max_active = max_active
+        self.ttl = ttl
+
+    def seen(self, update):
+        """Занести автора оновлення з приватного чату в реєстр (запис — при наступному flush)."""
+        if self.store is None:
+            return
+        chat = update.effective_chat
+        if chat is not None and chat.type == chat.PRIVATE:
+            self._seen[chat.id] = time.time()
+
+    def user_count(self) -> int:
+        """Користувачі з реєстру, яким можна надсилати повідомлення."""
+        if self.store is None:
+            return 0
+        return self.store.query("SELECT COUNT(*) FROM users WHERE blocked = 0")[0][0]
+
+    def _load(self, user_id: int):
+        pending = self._evicted.pop(user_id, None)
+        if pending is not None:
+            # витіснена, але ще не записана — беремо найсвіжішу версію з пам'яті
+            self._dirty.add(user_id)
+            return Session(json.loads(pending))
+        pending = self._flushing.get(user_id)
+        if pending is not None:
+            # рядок ще пишеться — у SQLite поки стара версія
+            self._saved[user_id] = pending
+            return Session(json.loads(pending))
+        data = None
+        if self.store is not None:
+            self.loads += 1
+            try:
+                data = self.store.load(user_id)
+            except (sqlite3.Error, ValueError):
+                logger.exception("Не вдалося завантажити сесію %s", user_id)
+        session = Session(data)
+        if data is not None:
+            self._saved[user_id] = json.dumps(session.to_dict(), ensure_ascii=False, sort_keys=True)
+        return session
+
+    def get(self, user_id: int) -> Session:
+        session = self._sessions.get(user_id)
+        if session is None:
+            session = self._sessions[user_id] = self._load(user_id)
+            if self.max_active and len(self._sessions) > self.max_active:
+                self._evict(next(iter(self._sessions)))
+                self.evicted_lru += 1
+        else:
+            self.hits += 1
+            self._sessions.move_to_end(user_id)
+            session.last_seen = time.monotonic()
+        # хендлер отримав змінюваний об'єкт — вважаємо, що він міг його змінити
+        self._dirty.add(user_id)
+        return session
+
+    def _evict(self, user_id: int):
+        session = self._sessions.pop(user_id)
+        saved = self._saved.pop(user_id, None)
+        if user_id in self._dirty:
+            self._dirty.discard(user_id)
+            data = self._serialize(user_id, session)
+            if data is not None and data != saved:
+                if self.store is not None:
+                    self._evicted[user_id] = data
+                else:
+                    self.lost += 1
+
+    def evict_idle(self):
+        """Витіснити сесії, що не використовувались довше за ttl."""
+        if not self.ttl:
+            return
+        deadline = time.monotonic() - self.ttl
+        while self._sessions:
+            user_id, session = next(iter(self._sessions.items()))
+            if session.last_seen > deadline:
+                break
+            self._evict(user_id)
+            self.evicted_ttl += 1
+
+    # ===============================
+    # Відкладений запис
+    # ===============================
+    @staticmethod
+    def _serialize(user_id, session):
+        try:
+            return json.dumps(session.to_dict(), ensure_ascii=False, sort_keys=True)
+        except (TypeError, ValueError):
+            logger.warning("Сесія %s не серіалізується в JSON, пропускаємо", user_id)
+            return None
+
+    def _collect(self):
+        rows = list(self._evicted.items())
+        self._evicted.clear()
+        for user_id in self._dirty:
+            session = self._sessions.get(user_id)
+            if session is None:
+                continue
+            data = self._serialize(user_id, session)
+            if data is not None and self._saved.get(user_id) != data:
+                rows.append((user_id, data))
+        self._dirty.clear()
+        return rows
+
+    def _mark_saved(self, rows):
+        for user_id, data in rows:
+            if user_id in self._sessions:
+                self._saved[user_id] = data
+        self.flushes += 1
+        self.written += len(rows)
+
+    async def flush(self):
+        self.evict_idle()
+        if self.store is None:
+            self._dirty.clear()
+            return
+        rows = self._collect()
+        users, self._seen = list(self._seen.items()), {}
+        if not rows and not users:
+            return
+        self._flushing.update(rows)
+        try:
+            await self.store.save_many_async(rows, users)
+        except sqlite3.Error:
+            logger.exception("Не вдалося записати %d сесій, повторимо пізніше", len(rows))
+            for user_id, data in rows:
+                if user_id in self._sessions:
+                    # _saved могло прийти з _flushing, а запис не відбувся
+                    self._saved.pop(user_id, None)
+                    self._dirty.add(user_id)
+                else:
+                    self._evicted.setdefault(user_id, data)
+            for user_id, seen in users:
+                self._seen.setdefault(user_id, seen)
+            return
+        else:
+            self._mark_saved(rows)
+        finally:
+            for user_id, data in rows:
+                if self._flushing.get(user_id) is data:
+                    del self._flushing[user_id]
+
+    async def _flush_loop(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush()
+
+    def start_flushing(self, interval: float):
+        # цикл потрібен і без сховища — він же витісняє сесії за ttl
+        if self._flush_task is None:
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_loop(interval))
+
+    async def close(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._flush_task
+            self._flush_task = None
+        if self.store is not None:
+            await self.flush()
+            self.store.close()
+            self.store = None
+
+    def stats(self):
+        return {
+            "in_memory": len(self._sessions),
+            "max_active": self.max_active,
+            "dirty": len(self._dirty),
+            "pending_evicted": len(self._evicted),
+            "flushing": len(self._flushing),
+            "pending_users": len(self._seen),
+            "hits": self.hits,
+            "loads": self.loads,
+            "flushes": self.flushes,
+            "written": self.written,
+            "evicted_lru": self.evicted_lru,
+            "evicted_ttl": self.evicted_ttl,
+            "lost": self.lost,
+            "persistent": self.store is not None,
+        }
+
+
+sessions = SessionManager()
+
+
+class BotContext(CallbackContext):
+    """CallbackContext, у якого user_data береться з SessionManager (з ледачим завантаженням)."""
+
+    @property
+    def user_data(self):
+        if self._user_id is None:
+            return None
+        return sessions.get(self._user_id)
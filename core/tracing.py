@@ -0,0 +1,86 @@
+# core/tracing.py
+"""
+Легке трасування оновлень: на кожне оновлення — Trace у contextvar, куди хендлери,
+черга чату і лімітер Bot API дописують спани (назва, зсув від початку, тривалість,
+очікування токена). Задачі з asyncio.gather успадковують контекст, тож паралельні
+запити одного оновлення потрапляють в один Trace.
+
+Оновлення, повільніші за SLOW_UPDATE_THRESHOLD, логуються з розкладкою по спанах.
+Коли поріг 0, Trace не створюється, а record() — лише ContextVar.get() і перевірка на None.
+"""
+
+import contextvars
+import logging
+import time
+
+from telegram import Update
+
+from config import SLOW_UPDATE_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar("update_trace", default=None)
+
+
+class Trace:
+    __slots__ = ("update_id", "label", "started", "spans", "token")
+
+    def __init__(self, update_id, label: str):
+        self.update_id = update_id
+        self.label = label
+        self.started = time.perf_counter()
+        self.spans = []  # (назва, зсув від початку с, тривалість с, очікування с)
+        self.token = None
+
+    def add(self, name: str, duration: float, wait: float = 0.0):
+        offset = time.perf_counter() - duration - self.started
+        self.spans.append((name, offset, duration, wait))
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def format(self) -> str:
+        parts = []
+        for name, offset, duration, wait in sorted(self.spans, key=lambda s: s[1]):
+            part = f"{name} @{offset * 1000:.0f} {duration * 1000:.0f} ms"
+            if wait >= 0.001:
+                part += f" (wait {wait * 1000:.0f} ms)"
+            parts.append(part)
+        return "; ".join(parts) or "no spans"
+
+
+def _label(update) -> str:
+    if isinstance(update, Update):
+        if update.callback_query:
+            return f"callback {update.callback_query.data}"
+        if update.message and update.message.text:
+            return f"message {update.message.text[:32]!r}"
+        if update.inline_query:
+            return "inline_query"
+    return type(update).__name__
+
+
+def begin(update):
+    """Почати Trace для оновлення (None, якщо трасування вимкнене)."""
+    if SLOW_UPDATE_THRESHOLD <= 0:
+        return None
+    trace = Trace(getattr(update, "update_id", None), _label(update))
+    trace.token = _current.set(trace)
+    return trace
+
+
+def finish(trace):
+    if trace is None:
+        return
+    _current.reset(trace.token)
+    elapsed = trace.elapsed()
+    if elapsed >= SLOW_UPDATE_THRESHOLD:
+        logger.warning("Slow update %s (%s): %.0f ms: %s",
+                       trace.update_id, trace.label, elapsed * 1000, trace.format())
+
+
+def record(name: str, duration: float, wait: float = 0.0):
+    """Дописати завершений спан у Trace поточного оновлення (якщо він є)."""
+    trace = _current.get()
+    if trace is not None:
+        trace.add(name, duration, wait)
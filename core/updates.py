@@ -0,0 +1,162 @@
+# core/updates.py
+"""
+Обробка оновлень: паралельно між чатами, строго послідовно в межах одного чату.
+
+PTB з concurrent_updates > 1 запускає оновлення одночасно, без гарантій порядку.
+Для бота це небезпечно: швидкі натискання одного користувача гонитимуться за
+user_data["image_message_ids"] чи career_progress. Тому кожен чат має свій lock,
+який існує лише доки в чаті є оновлення в обробці чи в черзі.
+
+Ліміт паралельності (max_running) — власний семафор, який оновлення бере лише після того,
+як дочекалося свого чату. Семафор базового класу стоїть перед чергою чату, тому PTB
+отримує практично необмежений ліміт: інакше оновлення, що просто чекають свого чату,
+займали б усі слоти.
+
+Заодно тут відсіюються зайві натискання в меню:
+- той самий callback у тому самому чаті протягом debounce_window — лише answer();
+- навігація, яка ще чекає своєї черги, скасовується новішою навігацією в цьому чаті.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from config import CB_PREFIX
+from core import tracing
+
+logger = logging.getLogger(__name__)
+
+# Ліміт для семафора BaseUpdateProcessor: реально паралельність обмежує max_running
+_BASE_LIMIT = 2 ** 31 - 1
+
+
+def chat_key(update):
+    """Ключ серіалізації: чат, а для оновлень без чату (inline-запити) — користувач."""
+    if isinstance(update, Update):
+        if update.effective_chat:
+            return update.effective_chat.id
+        if update.effective_user:
+            return update.effective_user.id
+    return None
+
+
+def menu_callback_data(update):
+    """callback_data навігації по меню або None для решти оновлень."""
+    if isinstance(update, Update) and update.callback_query:
+        data = update.callback_query.data or ""
+        if data.startswith(CB_PREFIX):
+            return data
+    return None
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    def __init__(self, max_concurrent_updates: int, debounce_window: float = 0.0, on_update=None):
+        super().__init__(_BASE_LIMIT)
+        if max_concurrent_updates < 1:
+            raise ValueError("max_concurrent_updates must be a positive integer")
+        self.max_running = max_concurrent_updates
+        self._running = asyncio.Semaphore(max_concurrent_updates)
+        self.debounce_window = debounce_window
+        # синхронний виклик на кожне оновлення до обробки (реєстр користувачів) — має бути дешевим
+        self.on_update = on_update
+        # chat_id -> [asyncio.Lock, кількість оновлень, що тримають або чекають lock,
+        #             номер останньої навігації]
+        self._locks = {}
+        # chat_id -> (callback_data, час) останньої навігації, від старших до новіших
+        self._last_nav = OrderedDict()
+        self.max_active_chats = 0
+        self.coalesced = 0   # повтори того самого callback, на які лише відповіли
+        self.dropped = 0     # навігації, скасовані новішими
+
+    def _is_repeat(self, key, data: str) -> bool:
+        now = time.monotonic()
+        # старі записи вже не можуть спрацювати — прибираємо їх з початку
+        while self._last_nav:
+            oldest = next(iter(self._last_nav))
+            if now - self._last_nav[oldest][1] < self.debounce_window:
+                break
+            del self._last_nav[oldest]
+        last = self._last_nav.get(key)
+        if last is not None and last[0] == data:
+            return True
+        self._last_nav[key] = (data, now)
+        self._last_nav.move_to_end(key)
+        return False
+
+    async def _answer_only(self, update, coroutine):
+        coroutine.close()
+        try:
+            async with self._running:
+                await update.callback_query.answer()
+        except Exception as e:
+            logger.warning("answerCallbackQuery не вдалося: %s", e)
+
+    async def do_process_update(self, update, coroutine):
+        trace = tracing.begin(update)
+        try:
+            await self._process(update, coroutine)
+        finally:
+            tracing.finish(trace)
+
+    async def _process(self, update, coroutine):
+        if self.on_update is not None and isinstance(update, Update):
+            self.on_update(update)
+        key = chat_key(update)
+        if key is None:
+            async with self._running:
+                await coroutine
+            return
+        nav_data = menu_callback_data(update)
+        if nav_data is None:
+            # команда чи інша кнопка між двома однаковими натисканнями — це вже не повтор
+            self._last_nav.pop(key, None)
+        elif self.debounce_window > 0 and self._is_repeat(key, nav_data):
+            self.coalesced += 1
+            await self._answer_only(update, coroutine)
+            return
+
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0, 0]
+            self.max_active_chats = max(self.max_active_chats, len(self._locks))
+        if nav_data is not None:
+            entry[2] += 1
+            nav_id = entry[2]
+        entry[1] += 1
+        queued = time.perf_counter()
+        try:
+            async with entry[0]:
+                waited = time.perf_counter() - queued
+                if waited >= 0.001:
+                    tracing.record("chat_lock", waited)
+                if nav_data is not None and nav_id != entry[2]:
+                    # поки чекали черги, користувач уже натиснув іншу кнопку
+                    self.dropped += 1
+                    await self._answer_only(update, coroutine)
+                    return
+                async with self._running:
+                    await coroutine
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                # чат простоює — lock більше не потрібен
+                del self._locks[key]
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def stats(self):
+        return {
+            "max_concurrent_updates": self.max_running,
+            "active_chats": len(self._locks),
+            "max_active_chats": self.max_active_chats,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+        }
@@ -0,0 +1,205 @@
+# core/webhook.py
+"""
+Власний webhook-сервер (aiohttp) з внутрішньою чергою оновлень.
+
+POST від Telegram лише перевіряється, відсіюється за update_id і кладеться в обмежену
+чергу — відповідь 200 іде одразу, не чекаючи обробки. Диспетчер розбирає чергу і
+передає кожне оновлення окремою задачею в Application через його update_processor
+(паралельність, порядок у чаті, debounce — див. core/updates.py).
+
+Якщо черга заповнена, сервер відповідає 503: Telegram повторить доставку пізніше,
+а бот не накопичує необмежений хвіст в пам'яті.
+"""
+
+import asyncio
+import contextlib
+import logging
+import time
+from collections import deque
+
+from aiohttp import web
+from telegram import Update
+
+from core.metrics import CONTENT_TYPE, registry
+
+logger = logging.getLogger(__name__)
+
+QUEUE_WAIT_SECONDS = registry.histogram(
+    "bot_update_queue_wait_seconds", "Time an accepted update waited in the internal queue"
+)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class RecentIds:
+    """Обмежена множина нещодавніх update_id: deque задає порядок витіснення, set — швидку перевірку."""
+
+    def __init__(self, size: int):
+        self._order = deque(maxlen=size)
+        self._ids = set()
+
+    def __contains__(self, update_id):
+        return update_id in self._ids
+
+    def add(self, update_id):
+        if update_id in self._ids:
+            return
+        if len(self._order) == self._order.maxlen:
+            self._ids.discard(self._order[0])
+        self._order.append(update_id)
+        self._ids.add(update_id)
+
+
+class UpdateQueue:
+    # поля stats(), що лише ростуть (у /metrics — counter-и)
+    COUNTERS = ("received", "duplicates", "rejected", "processed", "failed")
+
+    def __init__(self, application, maxsize: int = 1000, max_pending: int = 1000, dedup_size: int = 10000):
+        self.application = application
+        self.queue = asyncio.Queue(maxsize)
+        # скільки оновлень може бути взято з черги і ще не оброблено (разом з тими, що чекають свого чату)
+        self.max_pending = max_pending
+        self._slots = asyncio.Semaphore(max_pending)
+        self._dispatcher = None
+        self._tasks = set()
+        self._recent = RecentIds(dedup_size)
+        self.received = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.processed = 0
+        self.failed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    # ===============================
+    # Прийом
+    # ===============================
+    def offer(self, data: dict):
+        """Покласти сирий JSON оновлення в чергу. Повертає "queued", "duplicate" або "full"."""
+        self.received += 1
+        update_id = data.get("update_id")
+        if update_id is not None and update_id in self._recent:
+            self.duplicates += 1
+            return "duplicate"
+        if self.queue.full():
+            # update_id не запам'ятовуємо — повторну доставку треба буде прийняти
+            self.rejected += 1
+            return "full"
+        if update_id is not None:
+            self._recent.add(update_id)
+        self.queue.put_nowait((time.monotonic(), data))
+        return "queued"
+
+    async def put(self, data: dict):
+        """Як offer, але чекає на місце в черзі (воркер-процес: тиск передається назад фронту)."""
+        self.received += 1
+        await self.queue.put((time.monotonic(), data))
+
+    # ===============================
+    # Обробка
+    # ===============================
+    async def _dispatch(self):
+        # Кожне оновлення — окрема задача: якщо перші в черзі оновлення одного чату чекають
+        # свого lock-а, оновлення інших чатів не стоять за ними.
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._slots.acquire()
+            enqueued, data = await self.queue.get()
+            task = loop.create_task(self._handle(enqueued, data))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _handle(self, enqueued: float, data: dict):
+        application = self.application
+        try:
+            waited = time.monotonic() - enqueued
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            QUEUE_WAIT_SECONDS.observe(waited)
+            update = Update.de_json(data, application.bot)
+            await application.update_processor.process_update(
+                update, application.process_update(update)
+            )
+            self.processed += 1
+        except Exception:
+            self.failed += 1
+            logger.exception("Помилка обробки оновлення %s", data.get("update_id"))
+        finally:
+            self._slots.release()
+            self.queue.task_done()
+
+    def start(self):
+        self._dispatcher = asyncio.get_running_loop().create_task(self._dispatch())
+
+    async def stop(self, timeout: float = 10):
+        """Дочекатися обробки вже прийнятих оновлень (не довше timeout) і зупинити обробку."""
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(self.queue.join(), timeout)
+        tasks = list(self._tasks)
+        if self._dispatcher is not None:
+            tasks.append(self._dispatcher)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._dispatcher = None
+
+    def stats(self):
+        done = self.processed + self.failed
+        return {
+            "queued": self.queue.qsize(),
+            "maxsize": self.queue.maxsize,
+            "pending": len(self._tasks),
+            "received": self.received,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+            "processed": self.processed,
+            "failed": self.failed,
+            "avg_wait_ms": self.wait_total / done * 1000 if done else 0.0,
+            "max_wait_ms": self.wait_max * 1000,
+        }
+
+
+def make_webhook_app(accept, path: str, secret_token: str = None,
+                     metrics=None, metrics_path: str = "/metrics", metrics_token: str = None):
+    """
+    aiohttp-застосунок з маршрутом POST <path>.
+    accept(data) -> "queued" | "duplicate" | "full" — куди подіти JSON оновлення.
+    metrics() -> текст Prometheus: якщо задано, додається GET <metrics_path>
+    (з metrics_token — лише із заголовком Authorization: Bearer <token>).
+    """
+
+    async def handle(request):
+        if secret_token and request.headers.get(SECRET_HEADER) != secret_token:
+            return web.Response(status=403)
+        try:
+            data = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+        if not isinstance(data, dict):
+            return web.Response(status=400)
+        if accept(data) == "full":
+            return web.Response(status=503)
+        return web.Response(status=200)
+
+    async def handle_metrics(request):
+        if metrics_token and request.headers.get("Authorization") != f"Bearer {metrics_token}":
+            return web.Response(status=401)
+        return web.Response(body=metrics().encode("utf-8"), headers={"Content-Type": CONTENT_TYPE})
+
+    app = web.Application()
+    app.router.add_post(path, handle)
+    if metrics is not None and metrics_path:
+        app.router.add_get(metrics_path, handle_metrics)
+    return app
+
+
+async def serve_until_stopped(app, host: str, port: int, stop_event: asyncio.Event):
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    logger.info("Webhook server listening on %s:%s", host, port)
+    try:
+        await stop_event.wait()
+    finally:
+        await runner.cleanup()
@@ -0,0 +1,277 @@
+# core/workers.py
+"""
+Режим кількох процесів: один фронт-процес приймає webhook від Telegram і розподіляє
+оновлення між N воркер-процесами за chat_id, кожен воркер — повноцінний Application.
+
+- Оновлення одного чату завжди потрапляють в один і той самий воркер, тож порядок у чаті
+  та локальність сесій зберігаються (core/updates.py, core/sessions.py працюють як раніше).
+- Кожен воркер сам завантажує й компілює меню (власна копія MenuManager).
+- Сесії воркери ділять через той самий файл SQLite (WAL дозволяє кількох писачів по черзі).
+  Маршрутизація — за чатом, а сесії — за користувачем: у приватних чатах (основний сценарій)
+  користувач живе в одному воркері, але якщо він користується ботом і в групі, його сесію
+  можуть змінювати два воркери, і в SQLite лишиться версія того, хто записав останнім.
+- Кеш file_id картинок (core/photo_cache.py) воркери ділять через один файл, зливаючи
+  свої зміни з тим, що вже на диску.
+- Фронт стежить за воркерами і перезапускає ті, що впали.
+- Воркери періодично надсилають фронту свої метрики; /metrics фронту віддає їх з міткою worker.
+"""
+
+import asyncio
+import contextlib
+import logging
+import multiprocessing
+import queue as queue_module
+import signal
+import time
+
+from telegram import Bot
+
+from config import METRICS_PUSH_INTERVAL
+from core.metrics import registry
+from core.webhook import RecentIds, make_webhook_app, serve_until_stopped
+
+logger = logging.getLogger(__name__)
+
+# Поля оновлення, в яких є chat
+_CHAT_FIELDS = (
+    "message", "edited_message", "channel_post", "edited_channel_post",
+    "my_chat_member", "chat_member", "chat_join_request",
+)
+# Поля оновлення без чату — маршрутизуємо за користувачем
+_USER_FIELDS = (
+    "inline_query", "chosen_inline_result", "shipping_query", "pre_checkout_query", "poll_answer",
+)
+
+
+def route_key(data: dict):
+    """chat_id (або user_id для оновлень без чату) прямо з JSON, без розбору в Update."""
+    for field in _CHAT_FIELDS:
+        obj = data.get(field)
+        if obj:
+            return obj.get("chat", {}).get("id")
+    query = data.get("callback_query")
+    if query:
+        message = query.get("message")
+        if message:
+            return message.get("chat", {}).get("id")
+        return query.get("from", {}).get("id")
+    for field in _USER_FIELDS:
+        obj = data.get(field)
+        if obj:
+            user = obj.get("from") or obj.get("user") or {}
+            return user.get("id")
+    return None
+
+
+# ===============================================================
+# Воркер
+# ===============================================================
+def worker_main(index: int, inbound, metrics_out=None):
+    """Точка входу воркер-процесу."""
+    # SIGINT з терміналу отримує вся група процесів — зупинкою керує фронт
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(level=logging.INFO, format=f"[worker {index}] %(levelname)s:%(name)s:%(message)s")
+    from bot import build_application
+
+    if metrics_out is not None:
+        # Фронт читає знімки метрик лише на запит /metrics, тож канал черги може бути повний.
+        # Знімки не варто берегти: при виході не чекаємо, поки їх дочитають, інакше процес зависає
+        metrics_out.cancel_join_thread()
+    asyncio.run(_worker_loop(build_application(), inbound, index, metrics_out))
+
+
+async def _push_metrics(index: int, metrics_out):
+    while True:
+        await asyncio.sleep(METRICS_PUSH_INTERVAL)
+        # фронт забирає лише останній знімок; якщо його давно не питали — пропускаємо
+        with contextlib.suppress(queue_module.Full):
+            metrics_out.put_nowait((index, registry.collect()))
+
+
+def _next_update(inbound):
+    """Наступне оновлення з черги; None — час зупинятися (сигнал фронту або фронт помер)."""
+    parent = multiprocessing.parent_process()
+    while True:
+        try:
+            return inbound.get(timeout=1)
+        except queue_module.Empty:
+            # фронт убили через SIGKILL — None у черзі вже ніхто не покладе
+            if parent is not None and not parent.is_alive():
+                logger.warning("Front process is gone, stopping worker")
+                return None
+
+
+async def _worker_loop(application, inbound, index: int = 0, metrics_out=None):
+    from core.webhook import UpdateQueue
+
+    # невелика черга: решту тримає черга процесу, і тиск передається фронту
+    backlog = application.update_processor.max_running * 2
+    updates = UpdateQueue(application, maxsize=backlog, max_pending=backlog)
+    application.bot_data['update_queue'] = updates
+    registry.register_stats("bot_update_queue", updates.stats, "Webhook update queue",
+                            counters=UpdateQueue.COUNTERS)
+    loop = asyncio.get_running_loop()
+    pusher = None
+
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        updates.start()
+        if metrics_out is not None and METRICS_PUSH_INTERVAL > 0:
+            pusher = loop.create_task(_push_metrics(index, metrics_out))
+        while True:
+            data = await loop.run_in_executor(None, _next_update, inbound)
+            if data is None:
+                break
+            await updates.put(data)
+    finally:
+        if pusher is not None:
+            pusher.cancel()
+        await updates.stop()
+        if application.running:
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+
+
+# ===============================================================
+# Фронт
+# ===============================================================
+class WorkerPool:
+    def __init__(self, size: int, queue_size: int = 1000, dedup_size: int = 10000):
+        self.size = size
+        self._ctx = multiprocessing.get_context("spawn")
+        self.queue_size = queue_size
+        self._queues = [None] * size
+        self._metrics_queue = self._ctx.Queue(size * 4)
+        self._worker_metrics = {}    # index -> останні families від воркера
+        self._procs = [None] * size
+        self._recent = RecentIds(dedup_size)
+        self._monitor_task = None
+        self.received = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.restarts = 0
+
+    def _spawn(self, index: int):
+        # Кожному запуску — нова черга: якщо воркер помер, тримаючи її внутрішній lock
+        # (посеред get()), стара черга для нового процесу вже непридатна.
+        old, inbound = self._queues[index], self._ctx.Queue(self.queue_size)
+        if old is not None:
+            moved = 0
+            while True:
+                try:
+                    data = old.get_nowait()  # не чекає на lock: зайнятий — те, що лишилось, губимо
+                except queue_module.Empty:
+                    break
+                if data is not None:
+                    inbound.put_nowait(data)
+                    moved += 1
+            old.close()
+            old.cancel_join_thread()
+            if moved:
+                logger.info("Moved %d pending updates to the new queue of worker %d", moved, index)
+        self._queues[index] = inbound
+        proc = self._ctx.Process(
+            target=worker_main, args=(index, self._queues[index], self._metrics_queue),
+            name=f"bot-worker-{index}", daemon=True,
+        )
+        proc.start()
+        self._procs[index] = proc
+        logger.info("Worker %d started (pid %s)", index, proc.pid)
+
+    def start(self):
+        for index in range(self.size):
+            self._spawn(index)
+        self._monitor_task = asyncio.get_running_loop().create_task(self._monitor())
+
+    async def _monitor(self):
+        while True:
+            await asyncio.sleep(1)
+            for index, proc in enumerate(self._procs):
+                if proc is not None and not proc.is_alive():
+                    logger.error("Worker %d (pid %s) exited with %s, restarting", index, proc.pid, proc.exitcode)
+                    self.restarts += 1
+                    self._spawn(index)
+
+    def offer(self, data: dict):
+        """Маршрутизація JSON оновлення у воркер за chat_id. Повертає "queued", "duplicate" або "full"."""
+        self.received += 1
+        update_id = data.get("update_id")
+        if update_id is not None and update_id in self._recent:
+            self.duplicates += 1
+            return "duplicate"
+        key = route_key(data)
+        index = (key if isinstance(key, int) else hash(update_id)) % self.size
+        try:
+            self._queues[index].put_nowait(data)
+        except queue_module.Full:
+            self.rejected += 1
+            return "full"
+        if update_id is not None:
+            self._recent.add(update_id)
+        return "queued"
+
+    async def stop(self, timeout: float = 15):
+        if self._monitor_task is not None:
+            self._monitor_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._monitor_task
+        for q in self._queues:
+            with contextlib.suppress(queue_module.Full):
+                q.put_nowait(None)
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + timeout
+        for proc in self._procs:
+            if proc is None:
+                continue
+            await loop.run_in_executor(None, proc.join, max(0.1, deadline - time.monotonic()))
+            if proc.is_alive():
+                logger.warning("Worker pid %s did not stop in time, terminating", proc.pid)
+                proc.terminate()
+
+    def render_metrics(self):
+        """Метрики фронту разом з останніми знімками від кожного воркера (мітка worker)."""
+        while True:
+            try:
+                index, families = self._metrics_queue.get_nowait()
+            except queue_module.Empty:
+                break
+            self._worker_metrics[index] = families
+        return registry.render([
+            ((("worker", str(index)),), families) for index, families in sorted(self._worker_metrics.items())
+        ])
+
+    def stats(self):
+        return {
+            "workers": self.size,
+            "alive": sum(1 for p in self._procs if p is not None and p.is_alive()),
+            "restarts": self.restarts,
+            "received": self.received,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+        }
+
+
+async def run_front(token: str, webhook_url: str, port: int, workers: int, stop: asyncio.Event,
+                    secret_token: str = None, queue_size: int = 1000, dedup_size: int = 10000,
+                    base_url: str = None, metrics_path: str = "/metrics", metrics_token: str = None):
+    pool = WorkerPool(workers, queue_size=queue_size, dedup_size=dedup_size)
+    registry.register_stats("bot_worker_pool", pool.stats, "Worker pool",
+                            counters=("restarts", "received", "duplicates", "rejected"))
+    pool.start()
+    bot = Bot(token, base_url=base_url) if base_url else Bot(token)
+    try:
+        async with bot:
+            await bot.set_webhook(url=f"{webhook_url}/{token}", secret_token=secret_token)
+        logger.info("Front started: %d worker processes (webhook mode).", workers)
+        app = make_webhook_app(pool.offer, f"/{token}", secret_token,
+                               metrics=pool.render_metrics, metrics_path=metrics_path, metrics_token=metrics_token)
+        await serve_until_stopped(app, "0.0.0.0", port, stop)
+    finally:
+        await pool.stop()
@@ -1,6 +1,6 @@
 # handlers/admin.py
 """
-Прості адмін-команди: /reload, /admin
+Прості адмін-команди: /reload, /stats, /profile, /broadcast, /admin
 ADMINS визначені в config.ADMINS (user_id як рядок або @username)
 """
 
@@ -8,6 +8,11 @@ from telegram import Update
 from telegram.ext import ContextTypes, CommandHandler
 from config import TG_ADMINS
 from handlers.menu import menu_manager
+from core.broadcast import broadcaster, format_status
+from core.metrics import HANDLER_SECONDS
+from core.profiler import profiler, format_profile
+from core.photo_cache import photo_cache
+from core.sessions import sessions
 
 def _normalize_admins():
     # повертаємо список рядків для порівняння
@@ -29,18 +34,135 @@ async def reload_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text('Немає доступу. Ви не адмін.')
         return
     try:
-        menu_manager.load()
-        await update.message.reply_text('Конфігурація перезавантажена.')
+        snapshot = await menu_manager.reload()
+        await update.message.reply_text(f'Конфігурація перезавантажена (версія {snapshot.version}).')
     except Exception as e:
         await update.message.reply_text(f'Помилка при перезавантаженні: {e}')
 
+async def stats_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Статистика кешів бота (тільки для адмінів)."""
+    user = update.effective_user
+    if not is_admin(user):
+        await update.message.reply_text('Немає доступу. Ви не адмін.')
+        return
+    pc = menu_manager.plan_cache_stats()
+    ph = photo_cache.stats()
+    lines = [
+        f"Відповіді меню: {pc['size']} готових, влучань {pc['hit_rate']:.0%}, "
+        f"скомпільовано на льоту {pc['misses']}",
+        f"Картинки (file_id): {ph['size']} у кеші, влучань {ph['hit_rate']:.0%}, "
+        f"з кешу {ph['cached_avg_ms']:.0f} мс, за URL {ph['uncached_avg_ms']:.0f} мс",
+    ]
+    ss = sessions.stats()
+    lines.append(
+        f"Сесії: {ss['in_memory']}/{ss['max_active'] or '∞'} у пам'яті, змінених {ss['dirty']}, "
+        f"завантажено з диска {ss['loads']}, записано {ss['written']} за {ss['flushes']} скидань, "
+        f"витіснено LRU {ss['evicted_lru']} / TTL {ss['evicted_ttl']}"
+    )
+    queue = context.bot_data.get('update_queue')
+    if queue is not None:
+        uq = queue.stats()
+        lines.append(
+            f"Черга webhook: {uq['queued']}/{uq['maxsize']}, в обробці {uq['pending']}, оброблено {uq['processed']}, "
+            f"дублікатів {uq['duplicates']}, відхилено {uq['rejected']}, "
+            f"сер. очікування {uq['avg_wait_ms']:.0f} мс, макс {uq['max_wait_ms']:.0f} мс"
+        )
+    processor = context.application.update_processor
+    if hasattr(processor, 'stats'):
+        up = processor.stats()
+        lines.append(
+            f"Оновлення: до {up['max_concurrent_updates']} паралельно, "
+            f"активних чатів {up['active_chats']} (пік {up['max_active_chats']})"
+        )
+        lines.append(f"Натискання: повторів {up['coalesced']}, скасовано новішими {up['dropped']}")
+    limiter = context.bot.rate_limiter
+    if hasattr(limiter, 'stats'):
+        rl = limiter.stats()
+        lines.append(
+            f"Bot API: {rl['requests']} запитів, чекають {rl['waiting']} (пік {rl['max_waiting']}), "
+            f"сер. очікування {rl['avg_wait_ms']:.0f} мс, макс {rl['max_wait_ms']:.0f} мс, "
+            f"повторів після RetryAfter {rl['retries']}"
+        )
+    for (handler, kind), (count, total, p95) in sorted(HANDLER_SECONDS.summary().items()):
+        lines.append(f"{handler} [{kind}]: {count} оновл., сер. {total / count * 1000:.0f} мс, p95 ≤ {p95 * 1000:.0f} мс")
+    if sessions.store is not None:
+        lines.append(f"Користувачів у реєстрі: {sessions.user_count()}")
+    job = broadcaster.latest()
+    if job is not None and job.status == 'running':
+        lines.append(f"Розсилка #{job.id}: надіслано {job.sent} з {job.total}")
+    await update.message.reply_text('\n'.join(lines))
+
+async def profile_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/profile [N] — семплювати event loop N секунд (за замовчуванням 10) і показати зведення."""
+    user = update.effective_user
+    if not is_admin(user):
+        await update.message.reply_text('Немає доступу. Ви не адмін.')
+        return
+    if profiler.running:
+        await update.message.reply_text('Профайлер уже працює, зачекайте.')
+        return
+    try:
+        seconds = float(context.args[0]) if context.args else 10.0
+    except ValueError:
+        await update.message.reply_text('Використання: /profile [секунди]')
+        return
+    await update.message.reply_text(f'Профілювання {seconds:.0f} с...')
+    try:
+        result = await profiler.profile(seconds)
+    except RuntimeError as e:
+        await update.message.reply_text(f'Не вдалося: {e}')
+        return
+    # ліміт повідомлення Telegram — 4096 символів
+    await update.message.reply_text(format_profile(result)[:4000])
+
+BROADCAST_USAGE = (
+    'Використання:\n'
+    '/broadcast <текст> — розіслати текст усім користувачам\n'
+    '/broadcast у відповідь на повідомлення — розіслати його копію (з картинками й форматуванням)\n'
+    '/broadcast status — прогрес\n'
+    '/broadcast stop — зупинити'
+)
+
+async def broadcast_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/broadcast — фонова розсилка всім користувачам з реєстру (див. core/broadcast.py)."""
+    user = update.effective_user
+    if not is_admin(user):
+        await update.message.reply_text('Немає доступу. Ви не адмін.')
+        return
+    message = update.message
+    # текст беремо з повідомлення, а не з context.args — щоб зберегти переноси рядків
+    parts = (message.text or '').split(None, 1)
+    text = parts[1].strip() if len(parts) > 1 else ''
+    if text == 'status':
+        job = broadcaster.latest()
+        await message.reply_text(format_status(job, broadcaster.rate() or None) if job else 'Розсилок ще не було.')
+        return
+    if text == 'stop':
+        stopped = await broadcaster.stop(context.bot)
+        await message.reply_text('Розсилку зупинено.' if stopped else 'Зараз розсилка не триває.')
+        return
+    source = message.reply_to_message
+    if not text and source is None:
+        await message.reply_text(BROADCAST_USAGE)
+        return
+    status = await message.reply_text('📣 Розсилка готується...')
+    try:
+        job = await broadcaster.start(context.bot, status, text=None if source else text, source=source)
+    except RuntimeError as e:
+        await status.edit_text(f'Не вдалося почати розсилку: {e}')
+        return
+    await status.edit_text(format_status(job))
+
 async def admin_info(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     if not is_admin(user):
         await update.message.reply_text('Немає доступу. Ви не адмін.')
         return
-    await update.message.reply_text('Ви — адміністратор. Доступні команди: /reload')
+    await update.message.reply_text('Ви — адміністратор. Доступні команди: /reload, /stats, /profile, /broadcast')
 
 def register_handlers(application):
     application.add_handler(CommandHandler('reload', reload_cmd))
+    application.add_handler(CommandHandler('stats', stats_cmd))
+    application.add_handler(CommandHandler('profile', profile_cmd))
+    application.add_handler(CommandHandler('broadcast', broadcast_cmd))
     application.add_handler(CommandHandler('admin', admin_info))
@@ -8,44 +8,292 @@ Menu handler (webhook-ready). Behavior mirrors polling-version logic:
 - back-button support
 """
 
+import asyncio
+import functools
+import hashlib
 import json
+import logging
+import marshal
+import os
+import sys
+import time
+from collections import deque
+from types import MappingProxyType
+from typing import NamedTuple, Optional
+import telegram
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import ContextTypes, CallbackQueryHandler, CommandHandler
-from config import MENU_FILE, INFO_FILE, CB_PREFIX, WELCOME_TEXT
+from config import MENU_FILE, INFO_FILE, MENU_SNAPSHOT_FILE, CB_PREFIX, CAREER_CB_PREFIX, CAREER_TEST_STATELESS, WELCOME_TEXT
+from core.photo_cache import photo_cache
+from core.metrics import HANDLER_SECONDS, timed
+from core.search import Document, SearchIndex
+from core import tracing
+
+logger = logging.getLogger(__name__)
+
+# Скільки попередніх знімків пам'ятати для розбору id зі старих кнопок
+RETIRED_SNAPSHOTS = 8
+# Розкладка головного меню: скільки кнопок у кожному ряду (решта — рядами по 3)
+MAIN_MENU_LAYOUT = (1, 2, 2, 1, 3)
 
 # ===============================================================
-# Менеджер меню
+# Готові відповіді (render plans)
 # ===============================================================
-class MenuManager:
-    def __init__(self):
-        self.menu = {}
-        self.info = {}
-        self.load()
+class RenderPlan(NamedTuple):
+    """Скомпільована відповідь на натискання кнопки меню."""
+    kind: str                      # contacts / career_test / consult / faq / news / submenu / leaf / text / fallback
+    text: Optional[str]
+    parse_mode: Optional[str]
+    markup: InlineKeyboardMarkup
+    photos: tuple = ()
+    action: Optional[str] = None   # спеціальна дія замість редагування, напр. "career_test"
+
+    def to_dict(self):
+        return {
+            "kind": self.kind,
+            "text": self.text,
+            "parse_mode": self.parse_mode,
+            "photos": list(self.photos),
+            "action": self.action,
+            "keyboard": self.markup.to_dict()["inline_keyboard"],
+        }
 
-    def load(self):
-        with open(MENU_FILE, "r", encoding="utf-8") as f:
-            self.menu = json.load(f)
-        with open(INFO_FILE, "r", encoding="utf-8") as f:
-            self.info = json.load(f)
+
+CONTACT_FIELDS = ["phone", "email", "consultant_username", "schedule"]
+
+def format_contacts(contacts):
+    """Текст контактів, якщо запис info.json містить контактні поля; інакше None."""
+    if not (isinstance(contacts, dict) and any(field in contacts for field in CONTACT_FIELDS)):
+        return None
+    txt = "Контакти:\n"
+    for field, emoji, label in [
+        ("phone", "📞", "Телефон"),
+        ("email", "✉️", "Email"),
+        ("consultant_username", "💬", "Консультант"),
+        ("schedule", "🗓️", "Графік")
+    ]:
+        if value := contacts.get(field):
+            txt += f"{emoji} {label}: {value}\n"
+    return txt
+
+def format_faq(faqs):
+    if not faqs:
+        return "FAQ порожній."
+    return "\n\n".join([f"Q: {f.get('q')}\nA: {f.get('a')}" for f in faqs])
+
+def format_news(news):
+    if not news:
+        return "Новин немає."
+    lines = [f"{n.get('date')} — {n.get('title')}\n{n.get('text')}" for n in news[:3]]
+    return "\n\n".join(lines)
+
+def format_leaf(content: dict, node: dict):
+    title = content.get("title") or node.get("title") or node.get("text") or "Інформація відсутня."
+    description = content.get("description") or content.get("text") or ""
+    return f"*{title}*\n\n{description}" if description else f"*{title}*"
+
+def leaf_buttons_markup(buttons_data, callback_for):
+    kb = []
+    for b in buttons_data:
+        if b.get("url"):
+            kb.append([InlineKeyboardButton(b["text"], url=b["url"])])
+        elif b.get("key"):
+            cb = callback_for((b["key"],))
+            kb.append([InlineKeyboardButton(b["text"], callback_data=cb)])
+    return InlineKeyboardMarkup(kb) if kb else None
+
+# ===============================================================
+# Знімок даних меню
+# ===============================================================
+def _base36(n: int) -> str:
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    out = ""
+    while True:
+        n, r = divmod(n, 36)
+        out = digits[r] + out
+        if not n:
+            return out
+
+
+def validate_data(menu, info):
+    """Мінімальна перевірка структури перед заміною робочих даних."""
+    if not isinstance(menu, dict) or not isinstance(menu.get("items"), list):
+        raise ValueError("menu.json: очікується об'єкт з переліком items")
+    if not isinstance(info, dict):
+        raise ValueError("info.json: очікується об'єкт")
+
+
+class MenuSnapshot:
+    """
+    Незмінний знімок menu.json + info.json разом з усім, що з них обчислено:
+    індексами, клавіатурами та скомпільованими відповідями.
+    Хендлер бере знімок один раз і працює з ним до кінця оновлення.
+    """
+
+    def __init__(self, menu: dict, info: dict, version: int = 0, digest: str = ""):
+        validate_data(menu, info)
+        self._setup(menu, info, version, digest)
+        self._build_index()
+        self._assign_callback_ids()
+        self._warm_markup_cache()
+        self._compile_plans()
+
+    def _setup(self, menu: dict, info: dict, version: int, digest: str):
+        self.menu = menu
+        self.info = info
+        self.version = version
+        self.digest = digest
+        # Індекси меню:
+        #   nodes        — tuple(path) -> вузол
+        #   paths_by_key — key -> tuple шляхів до вузлів з цим ключем (у порядку обходу)
+        #   parents      — tuple(path) -> tuple(path) батьківського вузла
+        #   node_info    — tuple(path) -> відповідний запис з info.json (або None)
+        self.nodes = MappingProxyType({})
+        self.paths_by_key = MappingProxyType({})
+        self.parents = MappingProxyType({})
+        self.node_info = MappingProxyType({})
+        # Короткі callback_data: tuple(path) -> "menu:#<тег знімка>.<id>" і навпаки
+        self.callback_data = MappingProxyType({})
+        self.callback_paths = MappingProxyType({})
+        # Кеш клавіатур: (path, key вузла, row_size) -> InlineKeyboardMarkup
+        self._markup_cache = {}
+        # Однакові кнопки (напр. «Головне меню», «Назад» у сусідніх вузлів) — один об'єкт:
+        # кнопки PTB незмінні, а їх створення — основна частина часу компіляції
+        self._buttons = {}
+        # Скільки разів відповідь знайшлась готовою / компілювалась на льоту (get_plan)
+        self.plan_cache_hits = 0
+        self.plan_cache_misses = 0
+        # Скомпільовані відповіді: tuple(path) -> RenderPlan
+        self.plans = MappingProxyType({})
+        # Знімок, прочитаний зі скомпільованого файлу, створює клавіатури відповідей лише
+        # при першому зверненні: tuple(path) -> рядки кнопок (text, callback_data, url)
+        self._plans = {}
+        self._markup_specs = {}
+        # Повнотекстовий індекс (core/search.py): будується при першому пошуку або при /reload
+        # (в executor); у файл знімка не пишеться, тож холодний старт його не чекає
+        self.search_index = None
+
+    @classmethod
+    def from_bytes(cls, menu_raw: bytes, info_raw: bytes, version: int = 0):
+        """Знімок із сирого вмісту menu.json та info.json; digest — хеш обох файлів."""
+        digest = content_digest(menu_raw, info_raw)
+        return cls(json.loads(menu_raw), json.loads(info_raw), version, digest)
+
+    @staticmethod
+    def _children(node: dict, is_root: bool):
+        # та сама логіка, що й при навігації: корінь — items, далі — children або items
+        if is_root:
+            return node.get("items", [])
+        return node.get("children", []) or node.get("items", [])
+
+    def _build_index(self):
+        """Один обхід menu.json: після нього всі пошуки — це один доступ до dict."""
+        nodes, paths_by_key, parents, node_info = {}, {}, {}, {}
+
+        def walk(node, path):
+            nodes[path] = node
+            node_info[path] = self.info.get(path[-1]) if path else None
+            for child in self._children(node, not path):
+                key = child.get("key")
+                if not key:
+                    continue
+                child_path = path + (key,)
+                # як і в лінійному пошуку — виграє перший вузол з таким ключем
+                if child_path in nodes:
+                    continue
+                parents[child_path] = path
+                paths_by_key.setdefault(key, []).append(child_path)
+                walk(child, child_path)
+
+        walk(self.menu, ())
+
+        self.nodes = MappingProxyType(nodes)
+        self.paths_by_key = MappingProxyType({k: tuple(v) for k, v in paths_by_key.items()})
+        self.parents = MappingProxyType(parents)
+        self.node_info = MappingProxyType(node_info)
+
+    def _button_paths(self):
+        """Шляхи menu:/<key> з кнопок у info.json (поза деревом меню)."""
+        paths = []
+        for value in self.info.values():
+            if isinstance(value, dict):
+                for b in value.get("buttons", []):
+                    if b.get("key") and not b.get("url"):
+                        path = (b["key"],)
+                        if path not in self.nodes and path not in paths:
+                            paths.append(path)
+        return paths
+
+    @property
+    def callback_tag(self):
+        # тег із хешу вмісту: однаковий в усіх воркерах і після рестарту з тими самими даними
+        return self.digest[:6] if self.digest else f"v{self.version}"
+
+    def _assign_callback_ids(self):
+        """
+        Кожен вузол отримує короткий id (base36 номер в обході). callback_data кнопки —
+        menu:#<тег знімка>.<id>: до 64 байт за будь-якої глибини, розбір — один доступ до dict.
+        """
+        prefix = f"{CB_PREFIX}#{self.callback_tag}."
+        callback_data = {}
+        for n, path in enumerate(list(self.nodes) + self._button_paths()):
+            callback_data[path] = prefix + _base36(n)
+        self.callback_data = MappingProxyType(callback_data)
+        self.callback_paths = MappingProxyType({cb: path for path, cb in callback_data.items()})
+
+    def callback_for(self, path) -> str:
+        """callback_data для переходу на шлях; для невідомих шляхів — старий формат menu:a/b/c."""
+        path = tuple(path)
+        cb = self.callback_data.get(path)
+        return cb if cb is not None else CB_PREFIX + "/".join(path)
 
     def get_node_by_path(self, path: list):
-        node = self.menu
-        if not path:
-            return node
-        items = node.get("items", [])
-        for key in path:
-            found = None
-            for it in items:
-                if it.get("key") == key:
-                    found = it
-                    break
-            if not found:
-                return None
-            node = found
-            items = node.get("children", []) or node.get("items", [])
-        return node
+        return self.nodes.get(tuple(path))
+
+    def get_node_info(self, path: list):
+        """Запис з info.json для вузла; для невідомих шляхів — за останнім ключем."""
+        path = tuple(path)
+        if path in self.node_info:
+            return self.node_info[path]
+        return self.info.get(path[-1]) if path else None
+
+    def _warm_markup_cache(self):
+        # кеш живе разом зі знімком: /reload відкидає його цілком
+        cache = {}
+        for path, node in self.nodes.items():
+            cache[(path, node.get("key"), 3)] = self._render_markup(node, list(path))
+        self._markup_cache = cache
 
     def build_markup(self, node: dict, path: list, row_size: int = 3):
+        """Клавіатура для вузла; результат залежить лише від шляху та даних, тому кешується."""
+        path = tuple(path)
+        cache_key = (path, node.get("key"), row_size)
+        markup = self._markup_cache.get(cache_key)
+        if markup is not None:
+            return markup
+        markup = self._render_markup(node, list(path), row_size)
+        # довільні (невідомі) шляхи з callback-ів не кешуємо, щоб кеш не ріс необмежено
+        if path in self.nodes or len(path) <= 1:
+            self._markup_cache[cache_key] = markup
+        return markup
+
+    def plan_cache_stats(self):
+        total = self.plan_cache_hits + self.plan_cache_misses
+        return {
+            "hits": self.plan_cache_hits,
+            "misses": self.plan_cache_misses,
+            "hit_rate": self.plan_cache_hits / total if total else 0.0,
+            "size": len(self._plans),
+        }
+
+    def _button(self, text: str, callback_data: str = None, url: str = None):
+        key = (text, callback_data, url)
+        button = self._buttons.get(key)
+        if button is None:
+            button = self._buttons[key] = InlineKeyboardButton(text, callback_data=callback_data, url=url)
+        return button
+
+    def _render_markup(self, node: dict, path: list, row_size: int = 3):
 
     # ===============================
     # Визначаємо список дочірніх елементів
@@ -72,7 +320,7 @@ class MenuManager:
 
         # --- 1. Якщо кнопка містить прямий URL у JSON
             if "url" in it:
-                buttons.append(InlineKeyboardButton(text, url=it["url"]))
+                buttons.append(self._button(text, url=it["url"]))
                 continue
 
         # --- 2. Якщо кнопка використовує key → дивимось у info.json
@@ -81,22 +329,20 @@ class MenuManager:
 
             # Якщо в info.json URL → робимо URL кнопку
                 if isinstance(info_value, str) and info_value.startswith(("http://", "https://")):
-                    buttons.append(InlineKeyboardButton(text, url=info_value))
+                    buttons.append(self._button(text, url=info_value))
                     continue
 
             # Інакше — callback
-                cb = CB_PREFIX + "/".join(path + [key])
-                buttons.append(InlineKeyboardButton(text, callback_data=cb))
+                cb = self.callback_for(path + [key])
+                buttons.append(self._button(text, callback_data=cb))
                 continue
 
     # ===========================================================
     #                 РОЗКЛАДКА ГОЛОВНОГО МЕНЮ
     # ===========================================================
         if is_main_menu:
-            main_menu_layout = [1, 2, 2, 1, 3]
-
             i = 0
-            for row_count in main_menu_layout:
+            for row_count in MAIN_MENU_LAYOUT:
                 if i >= len(buttons):
                     break
                 kb.append(buttons[i:i + row_count])
@@ -134,20 +380,201 @@ class MenuManager:
     #      Кнопки НАЗАД і ГОЛОВНЕ МЕНЮ — завжди поруч
     # ===========================================================
         if path:
-            back_cb = CB_PREFIX + "/".join(path[:-1]) if len(path) > 1 else CB_PREFIX
-            home_cb = CB_PREFIX
+            back_cb = self.callback_for(path[:-1])
+            home_cb = self.callback_for(())
 
             kb.append([
-                InlineKeyboardButton("⬅️ Назад", callback_data=back_cb),
-                InlineKeyboardButton("🏠 Головне меню", callback_data=home_cb)
+                self._button("⬅️ Назад", callback_data=back_cb),
+                self._button("🏠 Головне меню", callback_data=home_cb)
             ])
 
         return InlineKeyboardMarkup(kb)
 
     
+    # ===============================
+    # Компіляція відповідей
+    # ===============================
+    def _compile_plans(self):
+        # кнопки в info.json ведуть на menu:/<key> — компілюємо і ці шляхи
+        self._plans = {path: self.compile_plan(path) for path in list(self.nodes) + self._button_paths()}
+        self.plans = MappingProxyType(self._plans)
+
+    def get_plan(self, path: list):
+        """Готова відповідь для шляху; невідомі шляхи компілюються на льоту без кешування."""
+        path = tuple(path)
+        plan = self.plans.get(path)
+        if plan is None:
+            self.plan_cache_misses += 1
+            return self.compile_plan(path)
+        self.plan_cache_hits += 1
+        if plan.markup is None and path in self._markup_specs:
+            plan = self._materialize(path, plan)
+        return plan
+
+    def _materialize(self, path: tuple, plan: RenderPlan) -> RenderPlan:
+        spec = self._markup_specs.pop(path)
+        markup = InlineKeyboardMarkup([[self._button(*b) for b in row] for row in spec])
+        plan = self._plans[path] = plan._replace(markup=markup)
+        return plan
+
+    # ===============================
+    # Пошук
+    # ===============================
+    def search_documents(self):
+        """Документи для пошуку: назва вузла, текст відповіді і назви батьківських розділів."""
+        # кнопки з info.json поза деревом меню мають назву лише на самій кнопці
+        button_titles = {}
+        for value in self.info.values():
+            if isinstance(value, dict):
+                for b in value.get("buttons", []):
+                    if b.get("key") and b.get("text"):
+                        button_titles.setdefault(b["key"], b["text"])
+        documents = []
+        for path, plan in self._plans.items():
+            if not path:
+                continue
+            node = self.nodes.get(path) or {}
+            title = node.get("text") or node.get("title") or button_titles.get(path[-1]) or path[-1]
+            ancestors = []
+            parent = self.parents.get(path, ())
+            while parent:
+                ancestors.append(self.nodes[parent].get("text") or "")
+                parent = self.parents.get(parent, ())
+            body = plan.text if plan.kind != "fallback" else ""
+            documents.append(Document(path, title, body or "", " ".join(reversed(ancestors))))
+        return documents
+
+    def build_search_index(self, previous: Optional[SearchIndex] = None) -> SearchIndex:
+        """Будує індекс; незмінені тексти беруться з індексу попереднього знімка."""
+        self.search_index = SearchIndex(self.search_documents(), previous)
+        return self.search_index
+
+    @property
+    def search(self) -> SearchIndex:
+        if self.search_index is None:
+            self.build_search_index()
+        return self.search_index
+
+    # ===============================
+    # Серіалізація (скомпільований знімок, див. tools/compile_content.py)
+    # ===============================
+    # Лише прості типи (dict, tuple, str, числа): файл читається через marshal, без pickle.
+    # Індекси меню виводяться з menu одним обходом, тож у файл не пишуться; таблиця
+    # callback_data пишеться — від неї залежать кнопки в уже надісланих повідомленнях.
+
+    def to_compiled(self) -> dict:
+        plans = []
+        for path, plan in self._plans.items():
+            if plan.markup is not None:
+                # об'єкти PTB дорого відновлювати — клавіатури як рядки кортежів (text, callback_data, url)
+                spec = tuple(
+                    tuple((b.text, b.callback_data, b.url) for b in row) for row in plan.markup.inline_keyboard
+                )
+            else:
+                spec = self._markup_specs.get(path)
+            plans.append((path, plan.kind, plan.text, plan.parse_mode, tuple(plan.photos), plan.action, spec))
+        return {
+            "menu": self.menu,
+            "info": self.info,
+            "digest": self.digest,
+            "callback_data": tuple(self.callback_data.items()),
+            "plans": tuple(plans),
+        }
+
+    @classmethod
+    def from_compiled(cls, data: dict, version: int = 0) -> "MenuSnapshot":
+        """Знімок з to_compiled(): без validate_data і компіляції відповідей."""
+        snapshot = cls.__new__(cls)
+        snapshot._setup(data["menu"], data["info"], version, data["digest"])
+        snapshot._build_index()
+        callback_data = dict(data["callback_data"])
+        snapshot.callback_data = MappingProxyType(callback_data)
+        snapshot.callback_paths = MappingProxyType({cb: path for path, cb in callback_data.items()})
+        for path, kind, text, parse_mode, photos, action, spec in data["plans"]:
+            snapshot._plans[path] = RenderPlan(kind, text, parse_mode, None, photos, action)
+            if spec is not None:
+                snapshot._markup_specs[path] = spec
+        snapshot.plans = MappingProxyType(snapshot._plans)
+        return snapshot
+
+    def compile_plan(self, path) -> RenderPlan:
+        """Вирішує, що показати для шляху: та сама логіка, що раніше жила в menu_callback."""
+        path = list(path)
+        node = self.get_node_by_path(path)
+
+        # Резервний пошук по ключу в меню
+        if node is None and path:
+            node = self.find_node_by_key(path[-1])
+
+        markup = self.build_markup(node or {}, path)
+        node_key = path[-1] if path else None
+        node_info = self.get_node_info(path)
+
+        # 🔹 Якщо ключ є в info і там словник контактів
+        contacts_text = format_contacts(node_info)
+        if contacts_text:
+            return RenderPlan("contacts", contacts_text, None, markup)
+
+        # Спеціальні випадки
+        if node_key == "career_test":
+            return RenderPlan("career_test", None, None, markup, action="career_test")
+
+        if node_key == "consult":
+            consult = self.info.get("contacts", {}).get("consultant_username")
+            if consult:
+                return RenderPlan("consult", f"Зв'язатися з консультантом: {consult}", None, markup)
+
+        if node_key == "faq":
+            return RenderPlan("faq", format_faq(self.info.get("faq", [])), None, markup)
+
+        if node_key == "news":
+            return RenderPlan("news", format_news(self.info.get("news", [])), None, markup)
+
+        # Підменю
+        children = node.get("children") or node.get("items") if node else None
+        if children:
+            info_text = None
+            image = None
+            if isinstance(node_info, str):
+                info_text = node_info
+            elif isinstance(node_info, dict):
+                info_text = node_info.get("text")
+                image = node_info.get("image")
+            label = info_text or node.get("text") or node.get("title") or "Оберіть пункт:"
+            return RenderPlan("submenu", label, None, markup, photos=(image,) if image else ())
+
+        # Leaf node
+        if isinstance(node_info, dict):
+            text = format_leaf(node_info, node or {})
+            image = node_info.get("image")
+            images = node_info.get("images")
+            photos = (image,) if image else tuple(images or ())
+            leaf_markup = leaf_buttons_markup(node_info.get("buttons", []), self.callback_for)
+            return RenderPlan("leaf", text, None, leaf_markup or markup, photos=photos)
+
+        if isinstance(node_info, str):
+            return RenderPlan("text", node_info or "Інформація відсутня.", None, markup)
+
+        return RenderPlan("fallback", "Інформація недоступна.", None, markup)
+
+    def dump_plans(self):
+        """Усі скомпільовані відповіді у вигляді, придатному для json.dump."""
+        return {"/".join(path): self.get_plan(path).to_dict() for path in list(self.plans)}
+
+    def image_urls(self):
+        """Усі картинки, які можуть бути надіслані з меню (для прогріву кешу file_id)."""
+        urls = []
+        for plan in self.plans.values():
+            for url in plan.photos:
+                if url not in urls:
+                    urls.append(url)
+        return urls
+
     def find_node_by_key(self, key: str, node=None):
         if node is None:
-            node = self.menu
+            paths = self.paths_by_key.get(key)
+            return self.nodes[paths[0]] if paths else None
+        # пошук у довільному піддереві (поза індексом)
         if node.get("key") == key:
             return node
         for child in node.get("items", []) + node.get("children", []):
@@ -157,6 +584,220 @@ class MenuManager:
         return None
 
 
+# ===============================================================
+# Скомпільований знімок на диску
+# ===============================================================
+COMPILED_MAGIC = b"MENUSNAP2"
+
+
+def content_digest(menu_raw: bytes, info_raw: bytes) -> str:
+    return hashlib.sha256(menu_raw + b"\0" + info_raw).hexdigest()
+
+
+@functools.lru_cache(maxsize=1)
+def _code_fingerprint() -> str:
+    """Знімок дійсний лише для того самого коду компіляції, PTB та Python."""
+    with open(__file__, "rb") as f:
+        source = f.read()
+    runtime = f"{telegram.__version__}|{sys.version_info[0]}.{sys.version_info[1]}".encode()
+    return hashlib.sha256(source + b"\0" + runtime).hexdigest()[:16]
+
+
+def write_compiled_snapshot(snapshot: MenuSnapshot, path=MENU_SNAPSHOT_FILE):
+    """
+    Заголовок (формат, хеш даних, відбиток коду, sha256 вмісту) + marshal з
+    MenuSnapshot.to_compiled(); запис атомарний.
+    """
+    payload = marshal.dumps(snapshot.to_compiled())
+    header = b" ".join((
+        COMPILED_MAGIC, snapshot.digest.encode(), _code_fingerprint().encode(),
+        hashlib.sha256(payload).hexdigest().encode(),
+    )) + b"\n"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(header + payload)
+    os.replace(tmp, path)
+    return len(header) + len(payload)
+
+
+def read_compiled_snapshot(digest: str, path=MENU_SNAPSHOT_FILE, version: int = 0):
+    """
+    Знімок з файлу одним читанням, якщо він зібраний з тих самих даних тим самим кодом;
+    інакше None (файлу немає, дані змінилися, оновили код, файл пошкоджено) — тоді
+    компілюємо з JSON. У файлі лише прості дані (marshal), код з нього не виконується.
+    """
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+    except OSError:
+        return None
+    header, _, payload = raw.partition(b"\n")
+    fields = header.split(b" ")
+    if fields[:3] != [COMPILED_MAGIC, digest.encode(), _code_fingerprint().encode()]:
+        logger.info("Compiled menu snapshot %s is stale, compiling from JSON", path)
+        return None
+    if fields[3:] != [hashlib.sha256(payload).hexdigest().encode()]:
+        logger.warning("Compiled menu snapshot %s is corrupted, compiling from JSON", path)
+        return None
+    try:
+        return MenuSnapshot.from_compiled(marshal.loads(payload), version)
+    except Exception:
+        logger.exception("Compiled menu snapshot %s is unreadable, compiling from JSON", path)
+        return None
+
+
+# ===============================================================
+# Менеджер меню
+# ===============================================================
+class MenuManager:
+    """
+    Тримає поточний MenuSnapshot і атомарно підміняє його при перезавантаженні.
+    JSON читається і компілюється поза event loop (в executor), тож /reload
+    не блокує обробку інших оновлень.
+    """
+
+    def __init__(self):
+        self.snapshot = None
+        self._mtimes = None
+        self._reload_lock = asyncio.Lock()
+        self._watch_task = None
+        # callback_data -> path попередніх знімків: кнопки в старих повідомленнях мають працювати
+        self._retired_callbacks = deque(maxlen=RETIRED_SNAPSHOTS)
+        self.load()
+
+    # ===============================
+    # Завантаження
+    # ===============================
+    @staticmethod
+    def _file_mtimes():
+        return tuple(os.stat(p).st_mtime_ns for p in (MENU_FILE, INFO_FILE))
+
+    def _read_snapshot(self, version: int, index_search: bool = False):
+        mtimes = self._file_mtimes()
+        with open(MENU_FILE, "rb") as f:
+            menu_raw = f.read()
+        with open(INFO_FILE, "rb") as f:
+            info_raw = f.read()
+        snapshot = read_compiled_snapshot(content_digest(menu_raw, info_raw), version=version)
+        if snapshot is None:
+            snapshot = MenuSnapshot.from_bytes(menu_raw, info_raw, version)
+        if index_search:
+            snapshot.build_search_index(self.snapshot.search_index if self.snapshot else None)
+        return snapshot, mtimes
+
+    def load(self):
+        """Синхронне завантаження (старт бота, CLI)."""
+        version = self.snapshot.version + 1 if self.snapshot else 1
+        snapshot, mtimes = self._read_snapshot(version)
+        self._swap(snapshot, mtimes)
+        return snapshot
+
+    def _swap(self, snapshot, mtimes):
+        old = self.snapshot
+        if old is not None and old.callback_tag != snapshot.callback_tag:
+            self._retired_callbacks.appendleft(old.callback_paths)
+        self.snapshot, self._mtimes = snapshot, mtimes
+
+    async def reload(self):
+        """Читає, перевіряє і компілює дані в executor, потім одним присвоєнням підміняє знімок."""
+        async with self._reload_lock:
+            loop = asyncio.get_running_loop()
+            snapshot, mtimes = await loop.run_in_executor(
+                None, self._read_snapshot, self.snapshot.version + 1, True
+            )
+            self._swap(snapshot, mtimes)
+        logger.info("Menu snapshot v%s loaded (%s)", snapshot.version, snapshot.digest[:12])
+        return snapshot
+
+    # ===============================
+    # Стеження за data/
+    # ===============================
+    async def _watch(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if self._file_mtimes() == self._mtimes:
+                    continue
+                await self.reload()
+            except Exception:
+                # залишаємо попередній знімок; спробуємо знову, коли файл зміниться
+                logger.exception("Автоматичне перезавантаження меню не вдалося")
+                try:
+                    self._mtimes = self._file_mtimes()
+                except OSError:
+                    pass
+
+    def start_watching(self, interval: float):
+        if interval > 0 and self._watch_task is None:
+            self._watch_task = asyncio.get_running_loop().create_task(self._watch(interval))
+
+    async def stop_watching(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+
+    # ===============================
+    # Розбір callback_data
+    # ===============================
+    def resolve_callback(self, data: str, snapshot=None):
+        """
+        Шлях вузла для callback_data меню:
+        - menu:#<тег>.<id> поточного знімка — один доступ до dict;
+        - id зі старих знімків — через збережені після /reload таблиці;
+        - menu:a/b/c — старий формат (кнопки, надіслані до появи id).
+        None — id невідомий (надто старе повідомлення).
+        """
+        snapshot = snapshot or self.snapshot
+        payload = data[len(CB_PREFIX):]
+        if payload.startswith("#"):
+            path = snapshot.callback_paths.get(data)
+            if path is None:
+                for retired in self._retired_callbacks:
+                    path = retired.get(data)
+                    if path is not None:
+                        break
+            return list(path) if path is not None else None
+        path_raw = payload.lstrip("/")
+        return path_raw.split("/") if path_raw else []
+
+    # ===============================
+    # Доступ до поточного знімка
+    # ===============================
+    @property
+    def menu(self):
+        return self.snapshot.menu
+
+    @property
+    def info(self):
+        return self.snapshot.info
+
+    def get_node_by_path(self, path: list):
+        return self.snapshot.get_node_by_path(path)
+
+    def find_node_by_key(self, key: str, node=None):
+        return self.snapshot.find_node_by_key(key, node)
+
+    def build_markup(self, node: dict, path: list, row_size: int = 3):
+        return self.snapshot.build_markup(node, path, row_size)
+
+    def get_plan(self, path: list):
+        return self.snapshot.get_plan(path)
+
+    def plan_cache_stats(self):
+        return self.snapshot.plan_cache_stats()
+
+    def dump_plans(self):
+        return self.snapshot.dump_plans()
+
+    def search(self, query: str, limit: int = 10):
+        return self.snapshot.search.search(query, limit)
+
+
 menu_manager = MenuManager()
 
 # ===============================================================
@@ -212,7 +853,98 @@ career_questions = [
     }
 ]
 
+# Факультети в порядку першої появи у відповідях — позиції у векторі балів
+career_faculties = tuple(dict.fromkeys(
+    fac for qdata in career_questions for fac in qdata["options"].values()
+))
+_CAREER_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+def encode_career_state(step: int, scores) -> str:
+    """Стан тесту в callback_data: ct:<номер питання>:<по одній base36-цифрі балів на факультет>."""
+    return f"{CAREER_CB_PREFIX}{step}:" + "".join(_CAREER_DIGITS[n] for n in scores)
+
+def decode_career_state(data: str):
+    """(номер питання, tuple балів) або None, якщо callback_data пошкоджений чи від іншого тесту."""
+    try:
+        step_raw, scores_raw = data[len(CAREER_CB_PREFIX):].split(":")
+        step = int(step_raw)
+        scores = tuple(_CAREER_DIGITS.index(c) for c in scores_raw)
+    except ValueError:
+        return None
+    if not 0 <= step <= len(career_questions) or len(scores) != len(career_faculties):
+        return None
+    # кожна відповідь додає рівно один бал
+    if sum(scores) != step:
+        return None
+    return step, scores
+
+def _build_career_keyboards():
+    """
+    Клавіатури питань будуються один раз при старті:
+    - stateful: career_ans:<faculty>, по одній на питання;
+    - stateless: на кожен досяжний стан (питання, бали) — у кнопках уже закодовано
+      наступний стан. Для 5 питань це ~160 клавіатур.
+    """
+    stateful = [
+        InlineKeyboardMarkup([
+            [InlineKeyboardButton(text=opt, callback_data=f"career_ans:{fac}")]
+            for opt, fac in qdata["options"].items()
+        ])
+        for qdata in career_questions
+    ]
+    stateless = {}
+    frontier = {(0,) * len(career_faculties)}
+    for step, qdata in enumerate(career_questions):
+        next_frontier = set()
+        for scores in frontier:
+            rows = []
+            for opt, fac in qdata["options"].items():
+                answered = list(scores)
+                answered[career_faculties.index(fac)] += 1
+                answered = tuple(answered)
+                next_frontier.add(answered)
+                rows.append([InlineKeyboardButton(
+                    text=opt, callback_data=encode_career_state(step + 1, answered)
+                )])
+            stateless[(step, scores)] = InlineKeyboardMarkup(rows)
+        frontier = next_frontier
+    return stateful, stateless
+
+career_keyboards, career_state_keyboards = _build_career_keyboards()
+
+
+async def _send_career_result(update: Update, best_faculty):
+    if not best_faculty:
+        await update.effective_message.reply_text("Ви не відповіли на жодне питання 😅")
+        return
+    snapshot = menu_manager.snapshot
+    kb = [[InlineKeyboardButton("➡️ Перейти до факультету", callback_data=snapshot.callback_for(("specs", best_faculty)))]]
+    faculty = snapshot.info.get(best_faculty)
+
+    if isinstance(faculty, dict):
+        faculty_name = faculty.get("text", best_faculty)
+    else:
+        faculty_name = faculty or best_faculty
+
+    await update.effective_message.reply_text(
+        f"✅ Ви завершили тест!\n\nВам найбільше підходить: *{faculty_name}*",
+        reply_markup=InlineKeyboardMarkup(kb),
+        parse_mode="Markdown"
+    )
+
+async def _send_career_step(update: Update, step: int, scores):
+    """Stateless-режим: усе, що треба знати про тест, прийшло в callback_data."""
+    if step >= len(career_questions):
+        best = max(range(len(scores)), key=scores.__getitem__) if any(scores) else None
+        await _send_career_result(update, career_faculties[best] if best is not None else None)
+        return
+    msg = update.message or update.callback_query.message
+    await msg.reply_text(career_questions[step]["q"], reply_markup=career_state_keyboards[(step, scores)])
+
 async def start_career_test(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if CAREER_TEST_STATELESS:
+        await _send_career_step(update, 0, (0,) * len(career_faculties))
+        return
     context.user_data["career_progress"] = 0
     context.user_data["career_scores"] = {}
     await send_next_question(update, context)
@@ -221,34 +953,11 @@ async def send_next_question(update: Update, context: ContextTypes.DEFAULT_TYPE)
     i = context.user_data.get("career_progress", 0)
     if i >= len(career_questions):
         scores = context.user_data.get("career_scores", {})
-        if not scores:
-            await update.effective_message.reply_text("Ви не відповіли на жодне питання 😅")
-            return
-        best_faculty = max(scores, key=scores.get)
-        kb = [[InlineKeyboardButton("➡️ Перейти до факультету", callback_data=f"{CB_PREFIX}/specs/{best_faculty}")]]
-        faculty = menu_manager.info.get(best_faculty)
-
-        if isinstance(faculty, dict):
-            faculty_name = faculty.get("text", best_faculty)
-        else:
-            faculty_name = faculty or best_faculty
-
-                      
-        await update.effective_message.reply_text(
-            f"✅ Ви завершили тест!\n\nВам найбільше підходить: *{faculty_name}*",
-            reply_markup=InlineKeyboardMarkup(kb),
-            parse_mode="Markdown"
-        )
+        await _send_career_result(update, max(scores, key=scores.get) if scores else None)
         return
 
-    qdata = career_questions[i]
-    buttons = [
-        [InlineKeyboardButton(text=opt, callback_data=f"career_ans:{fac}")]
-        for opt, fac in qdata["options"].items()
-    ]
-    markup = InlineKeyboardMarkup(buttons)
     msg = update.message or update.callback_query.message
-    await msg.reply_text(qdata["q"], reply_markup=markup)
+    await msg.reply_text(career_questions[i]["q"], reply_markup=career_keyboards[i])
 
 async def handle_career_answer(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
@@ -259,18 +968,43 @@ async def handle_career_answer(update: Update, context: ContextTypes.DEFAULT_TYP
     context.user_data["career_progress"] = context.user_data.get("career_progress", 0) + 1
     await send_next_question(update, context)
 
+async def handle_career_step(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    state = decode_career_state(query.data or "")
+    # стан має бути досяжним: кінець тесту або одна з попередньо побудованих клавіатур
+    if state is None or (state[0] < len(career_questions) and state not in career_state_keyboards):
+        await query.message.reply_text("Цей тест застарів. Почніть знову: /career_test")
+        return
+    await _send_career_step(update, *state)
+
 # ===============================================================
 # Основне меню
 # ===============================================================
 async def start_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = WELCOME_TEXT
-    markup = menu_manager.build_markup(menu_manager.menu, [])
+    snapshot = menu_manager.snapshot
+    markup = snapshot.build_markup(snapshot.menu, [])
     if update.message:
         await update.message.reply_text(text, reply_markup=markup)
     elif update.callback_query:
         await update.callback_query.message.edit_text(text, reply_markup=markup)
 
 
+async def send_menu_node(update: Update, context: ContextTypes.DEFAULT_TYPE, path):
+    """Показати вузол меню новим повідомленням (deep link з результатів пошуку)."""
+    plan = menu_manager.snapshot.get_plan(path)
+    if plan.action == "career_test":
+        await start_career_test(update, context)
+        return
+    message = update.effective_message
+    prev_chat_id, prev_ids = _take_prev_images(context)
+    await message.reply_text(plan.text, reply_markup=plan.markup, parse_mode=plan.parse_mode)
+    await _logged(_delete_messages(context.bot, prev_chat_id, prev_ids), "deleteMessages")
+    if plan.photos:
+        await _logged(_send_photos(message, plan.photos, context), "sendPhoto")
+
+
 
 
 #=========================
@@ -289,169 +1023,94 @@ async def safe_edit_text(message, text, reply_markup=None, parse_mode=None):
 # ===== menu_helpers.py =====
 
 
-CONTACT_FIELDS = ["phone", "email", "consultant_username", "schedule"]
+# deleteMessages приймає до 100 id за раз
+DELETE_MESSAGES_LIMIT = 100
 
-async def try_show_contacts(node_key, query, markup, info):
-    """
-    Перевіряє, чи в info[node_key] є контакти, і показує їх.
-    Повертає True, якщо контакти показано, False — інакше.
-    """
-    contacts = info.get(node_key)
-    if isinstance(contacts, dict) and any(field in contacts for field in CONTACT_FIELDS):
-        txt = "Контакти:\n"
-        for field, emoji, label in [
-            ("phone", "📞", "Телефон"),
-            ("email", "✉️", "Email"),
-            ("consultant_username", "💬", "Консультант"),
-            ("schedule", "🗓️", "Графік")
-        ]:
-            if value := contacts.get(field):
-                txt += f"{emoji} {label}: {value}\n"
-        await safe_edit_text(query.message, txt, reply_markup=markup)
-        return True
-    return False
-
-async def _delete_prev_image(context: ContextTypes.DEFAULT_TYPE):
-    msg_id = context.user_data.get("image_message_id")
+def _take_prev_images(context: ContextTypes.DEFAULT_TYPE):
+    """Забрати з user_data id попередніх картинок (синхронно, до будь-яких await)."""
+    msg_ids = context.user_data.get("image_message_ids")
     chat_id = context.user_data.get("image_chat_id")
-    if msg_id and chat_id:
-        try:
-            await context.bot.delete_message(chat_id=chat_id, message_id=msg_id)
-        except Exception:
-            pass  # якщо повідомлення вже видалено або немає доступу
-        finally:
-            context.user_data["image_message_id"] = None
-            context.user_data["image_chat_id"] = None
+    context.user_data["image_message_ids"] = None
+    context.user_data["image_chat_id"] = None
+    return chat_id, msg_ids
+
+async def _delete_messages(bot, chat_id, msg_ids):
+    if not (msg_ids and chat_id):
+        return
+    for i in range(0, len(msg_ids), DELETE_MESSAGES_LIMIT):
+        await bot.delete_messages(chat_id=chat_id, message_ids=msg_ids[i:i + DELETE_MESSAGES_LIMIT])
+
+async def _send_photos(message, photos, context: ContextTypes.DEFAULT_TYPE):
+    # одна картинка — sendPhoto, кілька — альбоми sendMediaGroup
+    if len(photos) == 1:
+        sent = [await photo_cache.send(message, photos[0])]
+    else:
+        sent = await photo_cache.send_group(message, list(photos))
+    if sent:
+        # запам'ятовуємо всі повідомлення, щоб потім видалити їх одним запитом
+        context.user_data["image_message_ids"] = [m.message_id for m in sent]
+        context.user_data["image_chat_id"] = sent[0].chat_id
+
+async def _logged(coro, what: str):
+    """Допоміжні запити (answer, видалення, фото) не повинні зривати основне редагування."""
+    try:
+        return await coro
+    except Exception as e:
+        logger.warning("%s не вдалося: %s", what, e)
+        return None
+
+def _record_timing(kind: str, started: float):
+    elapsed = time.perf_counter() - started
+    HANDLER_SECONDS.observe(elapsed, "menu", kind)
+    tracing.record(f"menu:{kind}", elapsed)
+    logger.debug("menu_callback [%s]: %.1f ms", kind, elapsed * 1000)
 
 
 async def menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    started = time.perf_counter()
     query = update.callback_query
-    await query.answer()
     data = query.data or ""
     if not data.startswith(CB_PREFIX):
+        await query.answer()
         return
 
-    path_raw = data[len(CB_PREFIX):].lstrip("/")
-    path = path_raw.split("/") if path_raw else []
-
-    node = menu_manager.get_node_by_path(path)
-
-    # Резервний пошук по ключу в меню
-    if node is None and path:
-        node = menu_manager.find_node_by_key(path[-1])
-
-    node_key = path[-1] if path else (node.get("key") if node else None)
-    markup = menu_manager.build_markup(node or {}, path)
-
-    # видаляємо попередню картинку
-    await _delete_prev_image(context)
-    # беремо інфо вузла
-    node_key = path[-1] if path else None
-    node_info = menu_manager.info.get(node_key) if node_key else None
-
-  
-
-    # 🔹 Якщо ключ є в info і там словник контактів
-    if node_key and node_key in menu_manager.info:
-        if await try_show_contacts(node_key, query, markup, menu_manager.info):
-            return
-
-    # Спеціальні випадки
-    if node_key == "career_test":
-        await start_career_test(update, context)
-        return
-
-    if node_key == "consult":
-        consult = menu_manager.info.get("contacts", {}).get("consultant_username")
-        if consult:
-            await query.message.edit_text(f"Зв'язатися з консультантом: {consult}", reply_markup=markup)
-            return
-
-    if node_key == "faq":
-        faqs = menu_manager.info.get("faq", [])
-        if not faqs:
-            await query.message.edit_text("FAQ порожній.", reply_markup=markup)
-            return
-        text = "\n\n".join([f"Q: {f.get('q')}\nA: {f.get('a')}" for f in faqs])
-        await query.message.edit_text(text, reply_markup=markup)
-        return
-
-    if node_key == "news":
-        news = menu_manager.info.get("news", [])
-        if not news:
-            await query.message.edit_text("Новин немає.", reply_markup=markup)
-            return
-        lines = [f"{n.get('date')} — {n.get('title')}\n{n.get('text')}" for n in news[:3]]
-        await query.message.edit_text("\n\n".join(lines), reply_markup=markup)
-        return
-
-    # Підменю
-    children = node.get("children") or node.get("items") if node else None
-    if children:
-        node_info = menu_manager.info.get(node_key) if node_key else None
-        info_text = None
-        image = None
-        if isinstance(node_info, str):
-            info_text = node_info
-        elif isinstance(node_info, dict):
-            info_text = node_info.get("text")
-            image = node_info.get("image")
-        label = info_text or node.get("text") or node.get("title") or "Оберіть пункт:"
-        if image:
-            msg_photo = await query.message.reply_photo(photo=image)
-            context.user_data["image_message_id"] = msg_photo.message_id
-            context.user_data["image_chat_id"] = msg_photo.chat_id
-        await query.message.edit_text(label, reply_markup=markup)
-        return
-
-    # Leaf node
-    content = menu_manager.info.get(node_key) if node_key else None
-    if isinstance(content, dict):
-        title = content.get("title") or node.get("title") or node.get("text") or "Інформація відсутня."
-        description = content.get("description") or content.get("text") or ""
-        text = f"*{title}*\n\n{description}" if description else f"*{title}*"
-        image = content.get("image")
-        images = content.get("images")
-        buttons_data = content.get("buttons", [])
-        kb = []
-        for b in buttons_data:
-            if b.get("url"):
-                kb.append([InlineKeyboardButton(b["text"], url=b["url"])])
-            elif b.get("key"):
-                cb = CB_PREFIX + "/" + b["key"]
-                kb.append([InlineKeyboardButton(b["text"], callback_data=cb)])
-        markup = InlineKeyboardMarkup(kb) if kb else markup
-
-        if image:
-            msg_photo = await query.message.reply_photo(photo=image)
-            context.user_data["image_message_id"] = msg_photo.message_id
-            context.user_data["image_chat_id"] = msg_photo.chat_id
-        elif images:
-            first_id = None
-            first_chat = None
-            for i, img in enumerate(images):
-                msg = await query.message.reply_photo(photo=img)
-                if i == 0:
-                    first_id = msg.message_id
-                    first_chat = msg.chat_id
-            if first_id:
-                context.user_data["image_message_id"] = first_id
-                context.user_data["image_chat_id"] = first_chat
-
-        await safe_edit_text(query.message, text, reply_markup=markup)
-        return
-
-    if isinstance(content, str):
-        await query.message.edit_text(content or "Інформація відсутня.", reply_markup=markup)
-        return
-    # видаляємо попередню картинку
-
-
-    # fallback
-    await query.message.edit_text("Інформація недоступна.", reply_markup=markup)
+    # один знімок на все оновлення, навіть якщо паралельно пройде /reload
+    snapshot = menu_manager.snapshot
+    path = menu_manager.resolve_callback(data, snapshot)
+    if path is None:
+        # кнопка з дуже старого меню — показуємо головне
+        path = []
+    plan = snapshot.get_plan(path)
+
+    # id попередніх картинок забираємо одразу — нові фото цього оновлення їх не перезапишуть
+    prev_chat_id, prev_ids = _take_prev_images(context)
+
+    # answer, видалення старих картинок і саме редагування йдуть паралельно:
+    # користувач чекає один round-trip до Telegram замість трьох-чотирьох
+    side_calls = [
+        _logged(query.answer(), "answerCallbackQuery"),
+        _logged(_delete_messages(context.bot, prev_chat_id, prev_ids), "deleteMessages"),
+    ]
+    if plan.action == "career_test":
+        main_call = start_career_test(update, context)
+    else:
+        main_call = safe_edit_text(query.message, plan.text, reply_markup=plan.markup, parse_mode=plan.parse_mode)
+        if plan.photos:
+            side_calls.append(_logged(_send_photos(query.message, plan.photos, context), "sendPhoto"))
+
+    try:
+        await asyncio.gather(main_call, *side_calls)
+    finally:
+        _record_timing(plan.kind, started)
 
 def register_handlers(application):
    
-    application.add_handler(CommandHandler("career_test", start_career_test))
-    application.add_handler(CallbackQueryHandler(handle_career_answer, pattern="^career_ans:"))
+    application.add_handler(CommandHandler("career_test", timed("career", "start", start_career_test)))
+    application.add_handler(CallbackQueryHandler(timed("career", "answer", handle_career_answer), pattern="^career_ans:"))
+    application.add_handler(CallbackQueryHandler(timed("career", "step", handle_career_step), pattern=f"^{CAREER_CB_PREFIX}"))
     application.add_handler(CallbackQueryHandler(menu_callback, pattern=f'^{CB_PREFIX}'))
+
+
+if __name__ == "__main__":
+    # python -m handlers.menu > plans.json — подивитися всі скомпільовані відповіді офлайн
+    json.dump(menu_manager.dump_plans(), sys.stdout, ensure_ascii=False, indent=2)
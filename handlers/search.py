@@ -0,0 +1,124 @@
+# handlers/search.py
+"""
+Пошук по меню: /search <запит> у чаті та inline-режим (@бот <запит> у будь-якому чаті).
+
+/search відповідає списком знайдених розділів з кнопками, що ведуть прямо у вузол меню.
+Inline-результат — текст розділу з кнопкою «Відкрити в боті»: deep link
+t.me/<бот>?start=m_<тег>_<id>, який /start розбирає в той самий callback меню.
+Inline-режим треба увімкнути в @BotFather (/setinline).
+"""
+
+from telegram import (
+    InlineKeyboardButton, InlineKeyboardMarkup, InlineQueryResultArticle, InputTextMessageContent, Update,
+)
+from telegram.constants import MessageLimit
+from telegram.ext import CommandHandler, ContextTypes, InlineQueryHandler
+
+from config import CB_PREFIX, SEARCH_RESULTS, SEARCH_INLINE_RESULTS, SEARCH_INLINE_CACHE_TIME
+from core.metrics import timed
+from handlers.menu import menu_manager, send_menu_node
+
+# payload deep link-а: лише [A-Za-z0-9_-], до 64 символів
+DEEP_LINK_PREFIX = "m_"
+BUTTON_TEXT_LIMIT = 60
+
+
+def deep_link_payload(callback_data: str):
+    """menu:#<тег>.<id> -> m_<тег>_<id>; None для callback-ів старого формату."""
+    payload = callback_data[len(CB_PREFIX):]
+    if not payload.startswith("#"):
+        return None
+    tag, _, node_id = payload[1:].partition(".")
+    return f"{DEEP_LINK_PREFIX}{tag}_{node_id}"
+
+
+def callback_from_payload(payload: str):
+    if not payload.startswith(DEEP_LINK_PREFIX):
+        return None
+    tag, sep, node_id = payload[len(DEEP_LINK_PREFIX):].partition("_")
+    return f"{CB_PREFIX}#{tag}.{node_id}" if sep else None
+
+
+def _label(snapshot, path, title: str) -> str:
+    """Назва з батьківським розділом: однакових «📞 Контакти» в меню багато."""
+    parent = snapshot.nodes.get(snapshot.parents.get(tuple(path), ()))
+    if len(path) > 1 and parent is not None and parent.get("text"):
+        return f"{parent['text']} › {title}"
+    return title
+
+
+def _short(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+async def search_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = " ".join(context.args or ()).strip()
+    if not query:
+        await update.message.reply_text("Що шукаємо? Наприклад: /search кафедра інформатики")
+        return
+    snapshot = menu_manager.snapshot
+    results = snapshot.search.search(query, SEARCH_RESULTS)
+    if not results:
+        await update.message.reply_text(f"За запитом «{query}» нічого не знайдено. Спробуйте інше слово або /start.")
+        return
+    lines = [f"🔎 Результати за запитом «{query}»:"]
+    keyboard = []
+    for r in results:
+        label = _label(snapshot, r.key, r.title)
+        lines.append(f"\n• {label}" + (f"\n{r.snippet}" if r.snippet else ""))
+        keyboard.append([InlineKeyboardButton(
+            _short(label, BUTTON_TEXT_LIMIT), callback_data=snapshot.callback_for(r.key),
+        )])
+    await update.message.reply_text(
+        _short("\n".join(lines), MessageLimit.MAX_TEXT_LENGTH), reply_markup=InlineKeyboardMarkup(keyboard),
+    )
+
+
+async def inline_search(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    inline_query = update.inline_query
+    query = inline_query.query.strip()
+    snapshot = menu_manager.snapshot
+    if query:
+        found = [(r.key, r.title, r.snippet) for r in snapshot.search.search(query, SEARCH_INLINE_RESULTS)]
+    else:
+        # порожній запит — розділи головного меню
+        found = [(path, node.get("text") or path[0], "") for path, node in snapshot.nodes.items() if len(path) == 1]
+    results = []
+    for path, title, snippet in found:
+        payload = deep_link_payload(snapshot.callback_for(path))
+        if payload is None:
+            continue
+        plan = snapshot.get_plan(path)
+        label = _label(snapshot, path, title)
+        results.append(InlineQueryResultArticle(
+            id=payload,
+            title=label,
+            description=snippet or None,
+            input_message_content=InputTextMessageContent(
+                _short(plan.text or label, MessageLimit.MAX_TEXT_LENGTH), parse_mode=plan.parse_mode,
+            ),
+            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton(
+                "Відкрити в боті", url=f"https://t.me/{context.bot.username}?start={payload}",
+            )]]),
+        ))
+    await inline_query.answer(results, cache_time=SEARCH_INLINE_CACHE_TIME)
+
+
+async def open_deep_link(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
+    """/start m_<тег>_<id>: показати вузол меню. False — це не наш deep link."""
+    if not context.args:
+        return False
+    data = callback_from_payload(context.args[0])
+    if data is None:
+        return False
+    path = menu_manager.resolve_callback(data)
+    if path is None:
+        # посилання з надто старого знімка — покажемо головне меню
+        return False
+    await send_menu_node(update, context, path)
+    return True
+
+
+def register_handlers(application):
+    application.add_handler(CommandHandler("search", timed("search", "command", search_cmd)))
+    application.add_handler(InlineQueryHandler(timed("search", "inline", inline_search)))
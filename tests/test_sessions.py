@@ -0,0 +1,78 @@
+# tests/test_sessions.py
+import asyncio
+import sqlite3
+import threading
+
+from core.sessions import SessionManager
+
+
+def _manager(tmp_path, max_active=1):
+    manager = SessionManager(max_active=max_active)
+    manager.open(tmp_path / "sessions.sqlite3")
+    return manager
+
+
+def test_evicted_session_survives_reload_during_flush(tmp_path):
+    """Користувач повертається, поки його витіснену сесію ще пишуть у SQLite."""
+
+    async def scenario():
+        manager = _manager(tmp_path)
+        manager.get(1)["career_progress"] = 1
+        await manager.flush()
+
+        manager.get(1)["career_progress"] = 2
+        manager.get(2)  # max_active=1 — сесія 1 витіснена, ще не записана
+
+        started, release = threading.Event(), threading.Event()
+        save_many = manager.store.save_many
+
+        def slow_save_many(rows, users=()):
+            started.set()
+            release.wait(5)
+            save_many(rows, users)
+
+        manager.store.save_many = slow_save_many
+        flush = asyncio.create_task(manager.flush())
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+
+        assert manager.get(1)["career_progress"] == 2
+
+        release.set()
+        await flush
+        manager.store.save_many = save_many
+        await manager.flush()
+
+        assert manager.get(1)["career_progress"] == 2
+        assert manager.store.load(1) == {"career_progress": 2}
+        await manager.close()
+
+    asyncio.run(scenario())
+
+
+def test_failed_flush_keeps_session_loaded_from_pending_write(tmp_path):
+    async def scenario():
+        manager = _manager(tmp_path)
+        manager.get(1)["career_progress"] = 3
+        manager.get(2)
+
+        started, release = threading.Event(), threading.Event()
+        save_many = manager.store.save_many
+
+        def failing_save_many(rows, users=()):
+            started.set()
+            release.wait(5)
+            raise sqlite3.OperationalError("disk I/O error")
+
+        manager.store.save_many = failing_save_many
+        flush = asyncio.create_task(manager.flush())
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        assert manager.get(1)["career_progress"] == 3
+        release.set()
+        await flush
+
+        manager.store.save_many = save_many
+        await manager.flush()
+        assert manager.store.load(1) == {"career_progress": 3}
+        await manager.close()
+
+    asyncio.run(scenario())
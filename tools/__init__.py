@@ -0,0 +1,2 @@
+# tools/__init__.py
+# Службові утиліти для розробки: фейковий Bot API, навантажувальні тести
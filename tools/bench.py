@@ -0,0 +1,274 @@
+# tools/bench.py
+"""
+Мікробенчмарки гарячих шляхів меню (чистий Python, без мережі й Telegram).
+
+Набори даних:
+  * real — data/menu.json + data/info.json;
+  * x10, x100 — синтетичні меню: копії реального дерева з суфіксами ключів,
+    удесятеро/усотеро більше вузлів; кожна наступна десятка копій вкладена в попередню,
+    тож глибина теж зростає (x100 — на 10 рівнів глибше).
+
+Кейси: завантаження знімка, get_node_by_path, find_node_by_key, build_markup
+(головне меню, кастомний layout, стандартні ряди — з кешу і без нього), форматування
+текстів (контакти, FAQ, новини, leaf), компіляція відповідей, побудова пошукового
+індексу (повна і з попереднього індексу) та пошукові запити.
+
+Результати — JSON (нс на операцію), який можна порівняти з прогоном на іншому коміті:
+    python -m tools.bench --output before.json
+    git checkout <інший коміт>
+    python -m tools.bench --compare before.json
+"""
+
+import argparse
+import copy
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+
+from config import MENU_FILE, INFO_FILE, BASE_DIR
+from core.search import SearchIndex
+from handlers.menu import (
+    MenuManager, MenuSnapshot, CONTACT_FIELDS,
+    format_contacts, format_faq, format_news, format_leaf,
+)
+
+SCALES = {"x10": 10, "x100": 100}
+# Скільки копій вкладати одну в одну: визначає приріст глибини синтетичних меню
+NEST_EVERY = 10
+
+
+# ===============================
+# Дані
+# ===============================
+def _suffix_tree(node: dict, suffix: str, renamed: set) -> dict:
+    node = copy.deepcopy(node)
+
+    def walk(n):
+        if n.get("key"):
+            renamed.add(n["key"])
+            n["key"] += suffix
+        for child in n.get("items", []) + n.get("children", []) + n.get("buttons", []):
+            walk(child)
+
+    walk(node)
+    return node
+
+
+def scale_data(menu: dict, info: dict, factor: int):
+    """Меню й info з factor копій реального дерева; копія i>0 — підменю group_i."""
+    menu = copy.deepcopy(menu)
+    info = dict(info)
+    original = list(menu["items"])
+    groups = {}
+    for i in range(1, factor):
+        suffix = f"_{i}"
+        renamed = set()
+        items = [_suffix_tree(item, suffix, renamed) for item in original]
+        group = {"key": f"group{suffix}", "text": f"Копія {i}", "children": items}
+        groups[i] = group
+        parent = groups.get(i - NEST_EVERY)
+        (parent["children"] if parent else menu["items"]).append(group)
+        for key in renamed:
+            value = info.get(key)
+            if value is None:
+                continue
+            if isinstance(value, dict) and value.get("buttons"):
+                value = dict(value)
+                value["buttons"] = [
+                    dict(b, key=b["key"] + suffix) if b.get("key") in renamed else b
+                    for b in value["buttons"]
+                ]
+            info[key + suffix] = value
+    return menu, info
+
+
+def load_datasets(names):
+    menu_raw = MENU_FILE.read_bytes()
+    info_raw = INFO_FILE.read_bytes()
+    menu, info = json.loads(menu_raw), json.loads(info_raw)
+    datasets = {}
+    for name in names:
+        if name == "real":
+            datasets[name] = (menu_raw, info_raw)
+        else:
+            scaled_menu, scaled_info = scale_data(menu, info, SCALES[name])
+            datasets[name] = (
+                json.dumps(scaled_menu, ensure_ascii=False).encode("utf-8"),
+                json.dumps(scaled_info, ensure_ascii=False).encode("utf-8"),
+            )
+    return datasets
+
+
+# ===============================
+# Кейси
+# ===============================
+def _first(snapshot, predicate):
+    for path, node in snapshot.nodes.items():
+        if predicate(path, node):
+            return path, node
+    return None, None
+
+
+def build_cases(name: str, menu_raw: bytes, info_raw: bytes):
+    """name -> (callable, кількість операцій за один виклик)."""
+    snapshot = MenuSnapshot.from_bytes(menu_raw, info_raw)
+    info = snapshot.info
+    paths = list(snapshot.nodes)
+    keys = list(snapshot.paths_by_key)
+    missing = [path + ("missing",) for path in paths]
+    sample_keys = keys[::max(1, len(keys) // 50)]
+
+    cases = {
+        "load_snapshot": (lambda: MenuSnapshot.from_bytes(menu_raw, info_raw), 1),
+        "get_node_by_path": (lambda: [snapshot.get_node_by_path(p) for p in paths], len(paths)),
+        "get_node_by_path_miss": (lambda: [snapshot.get_node_by_path(p) for p in missing], len(missing)),
+        "find_node_by_key": (lambda: [snapshot.find_node_by_key(k) for k in keys], len(keys)),
+        # обхід піддерева без індексу (шлях, яким іде find_node_by_key(key, node))
+        "find_node_by_key_walk": (
+            lambda: [snapshot.find_node_by_key(k, snapshot.menu) for k in sample_keys], len(sample_keys)
+        ),
+        "compile_plan_all": (lambda: [snapshot.compile_plan(p) for p in paths], len(paths)),
+        "get_plan": (lambda: [snapshot.get_plan(p) for p in paths], len(paths)),
+    }
+    if name == "real":
+        manager = MenuManager()
+        cases["menu_manager_load"] = (manager.load, 1)
+
+    layouts = {
+        "main": ((), snapshot.menu),
+        "layout": _first(snapshot, lambda p, n: p and n.get("layout")),
+        "default": _first(snapshot, lambda p, n: p and not n.get("layout") and (n.get("children") or n.get("items"))),
+    }
+    for label, (path, node) in layouts.items():
+        if node is None:
+            continue
+        cases[f"build_markup_{label}"] = (lambda n=node, p=list(path): snapshot.build_markup(n, p), 1)
+        cases[f"render_markup_{label}"] = (lambda n=node, p=list(path): snapshot._render_markup(n, p), 1)
+
+    contacts = next((v for v in info.values()
+                     if isinstance(v, dict) and any(f in v for f in CONTACT_FIELDS)), None)
+    if contacts is not None:
+        cases["format_contacts"] = (lambda: format_contacts(contacts), 1)
+    cases["format_faq"] = (lambda: format_faq(info.get("faq", [])), 1)
+    cases["format_news"] = (lambda: format_news(info.get("news", [])), 1)
+    leaf_path, _ = _first(snapshot, lambda p, n: isinstance(snapshot.node_info.get(p), dict)
+                          and not (n.get("children") or n.get("items")))
+    if leaf_path is not None:
+        leaf_info, leaf_node = snapshot.node_info[leaf_path], snapshot.nodes[leaf_path]
+        cases["format_leaf"] = (lambda: format_leaf(leaf_info, leaf_node), 1)
+
+    documents = snapshot.search_documents()
+    index = SearchIndex(documents)
+    queries = ("кафедри", "контакти філологічного", "графік", "вступ", "фіз", "немає такого")
+    cases["search_index_build"] = (lambda: SearchIndex(documents), 1)
+    cases["search_index_rebuild"] = (lambda: SearchIndex(documents, index), 1)
+    cases["search"] = (lambda: [index.search(q, 8) for q in queries], len(queries))
+
+    meta = {"nodes": len(snapshot.nodes), "max_depth": max(len(p) for p in paths),
+            "menu_bytes": len(menu_raw), "info_bytes": len(info_raw)}
+    return cases, meta
+
+
+def measure(func, ops: int, repeat: int, min_time: float) -> dict:
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    if elapsed < min_time:
+        number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    runs = [t / number / ops * 1e9 for t in timer.repeat(repeat=repeat, number=number)]
+    return {
+        "ns_per_op": round(min(runs), 1),
+        "median_ns": round(statistics.median(runs), 1),
+        "ops_per_call": ops,
+        "calls": number * repeat,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(datasets, case_filter=None, repeat=5, min_time=0.2, log=sys.stderr) -> dict:
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "datasets": {},
+        "results": {},
+    }
+    for name, (menu_raw, info_raw) in datasets.items():
+        cases, meta = build_cases(name, menu_raw, info_raw)
+        report["datasets"][name] = meta
+        results = report["results"][name] = {}
+        for case, (func, ops) in cases.items():
+            if case_filter and case_filter not in case:
+                continue
+            results[case] = measure(func, ops, repeat, min_time)
+            print(f"{name:<6} {case:<26} {results[case]['ns_per_op']:>14.1f} ns/op", file=log)
+    return report
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> tuple:
+    """Рядки таблиці порівняння з базовим прогоном і кількість регресій понад threshold."""
+    lines = [f"{'dataset':<8}{'case':<27}{'base ns':>14}{'now ns':>14}{'change':>9}"]
+    regressions = 0
+    for name, results in report["results"].items():
+        for case, result in results.items():
+            base = baseline.get("results", {}).get(name, {}).get(case)
+            if not base:
+                continue
+            change = result["ns_per_op"] / base["ns_per_op"] - 1 if base["ns_per_op"] else 0.0
+            mark = ""
+            if change > threshold:
+                regressions += 1
+                mark = "  !"
+            lines.append(f"{name:<8}{case:<27}{base['ns_per_op']:>14.1f}{result['ns_per_op']:>14.1f}"
+                         f"{change:>+8.1%}{mark}")
+    return lines, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Мікробенчмарки MenuSnapshot / MenuManager")
+    parser.add_argument("--datasets", default="real,x10,x100", help="через кому: real, x10, x100")
+    parser.add_argument("--filter", default=None, help="лише кейси, що містять підрядок")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="мінімальна тривалість одного заміру, с")
+    parser.add_argument("--output", default=None, help="зберегти результати в JSON")
+    parser.add_argument("--compare", default=None, help="JSON попереднього прогону для порівняння")
+    parser.add_argument("--threshold", type=float, default=0.10, help="регресія, якщо повільніше на цю частку")
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.datasets.split(",") if n.strip()]
+    unknown = [n for n in names if n != "real" and n not in SCALES]
+    if unknown:
+        parser.error(f"невідомі набори даних: {', '.join(unknown)}")
+
+    report = run(load_datasets(names), args.filter, args.repeat, args.min_time)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        lines, regressions = compare(report, baseline, args.threshold)
+        print("\n".join(lines))
+        if regressions:
+            print(f"{regressions} regression(s) above {args.threshold:.0%}")
+            sys.exit(1)
+    elif not args.output:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# tools/compile_content.py
+"""
+Компілятор контенту: перевіряє data/menu.json + data/info.json і записує скомпільований
+знімок меню (індекси, callback-и, готові відповіді) з хешем вмісту в STATE_DIR.
+
+Бот при старті читає цей знімок одним читанням, якщо хеш збігається з поточними
+JSON-файлами і код не змінювався; інакше компілює меню з JSON, як і раніше.
+
+Перевірки (помилки — код виходу 1):
+  * вузол меню чи кнопка в info.json, для якого немає запису в info.json (користувач
+    побачить «Інформація недоступна»);
+  * факультети профорієнтаційного тесту, яких немає в info.json або в меню «specs»;
+  * callback_data довші за 64 байти (Telegram відхилить усю клавіатуру);
+  * layout, сума якого не збігається з кількістю кнопок вузла.
+Попередження: однакові ключі в різних гілках меню (пошук за ключем знайде лише перший).
+
+    python -m tools.compile_content            # перевірити і записати знімок
+    python -m tools.compile_content --check    # лише перевірити
+    python -m tools.compile_content --force    # записати знімок попри помилки (напр. при збірці образу)
+"""
+
+import argparse
+import sys
+import time
+
+from config import MENU_FILE, INFO_FILE, MENU_SNAPSHOT_FILE
+from handlers.menu import (
+    MAIN_MENU_LAYOUT, MenuSnapshot, career_faculties, career_keyboards, career_state_keyboards, write_compiled_snapshot,
+)
+
+CALLBACK_DATA_LIMIT = 64
+
+
+def _label(path) -> str:
+    return "/".join(path) or "<головне меню>"
+
+
+def _markups(snapshot: MenuSnapshot):
+    for path in list(snapshot.plans):
+        yield _label(path), snapshot.get_plan(path).markup
+    for i, markup in enumerate(career_keyboards):
+        yield f"<тест, питання {i + 1}>", markup
+    for (step, scores), markup in career_state_keyboards.items():
+        yield f"<тест, крок {step} {scores}>", markup
+
+
+def check_content(snapshot: MenuSnapshot):
+    """(помилки, попередження) — списки рядків."""
+    errors, warnings = [], []
+
+    for path in list(snapshot.plans):
+        if snapshot.get_plan(path).kind == "fallback":
+            where = "вузол меню" if path in snapshot.nodes else "кнопка з info.json"
+            # бот покаже «Інформація недоступна.» — розділ без контенту, а не зламане меню
+            warnings.append(f"{_label(path)}: {where} без запису '{path[-1]}' в info.json")
+
+    for faculty in career_faculties:
+        if faculty not in snapshot.info:
+            errors.append(f"тест: факультету '{faculty}' немає в info.json")
+        if ("specs", faculty) not in snapshot.nodes:
+            errors.append(f"тест: кнопка результату веде на specs/{faculty}, якого немає в меню")
+
+    seen = set()
+    for where, markup in _markups(snapshot):
+        if markup is None:
+            continue
+        for row in markup.inline_keyboard:
+            for button in row:
+                data = button.callback_data
+                if isinstance(data, str) and len(data.encode("utf-8")) > CALLBACK_DATA_LIMIT and data not in seen:
+                    seen.add(data)
+                    errors.append(f"{where}: callback_data '{data}' довший за {CALLBACK_DATA_LIMIT} байти")
+
+    for path, node in snapshot.nodes.items():
+        layout = MAIN_MENU_LAYOUT if not path else node.get("layout")
+        if not layout:
+            continue
+        children = node.get("buttons") or node.get("items") or node.get("children") or []
+        if sum(layout) != len(children):
+            message = f"{_label(path)}: layout {list(layout)} на {sum(layout)} кнопок, а пунктів {len(children)}"
+            # головне меню має розкладку в коді; зайві пункти просто підуть рядами по 3
+            (warnings if not path else errors).append(message)
+
+    for key, paths in snapshot.paths_by_key.items():
+        if len(paths) > 1:
+            warnings.append(f"ключ '{key}' зустрічається в кількох місцях: " + ", ".join(map(_label, paths)))
+
+    return errors, warnings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Перевірка і компіляція menu.json / info.json")
+    parser.add_argument("--check", action="store_true", help="лише перевірити, не записувати знімок")
+    parser.add_argument("--strict", action="store_true", help="вважати попередження помилками")
+    parser.add_argument("--force", action="store_true", help="записати знімок навіть за наявності помилок")
+    parser.add_argument("--output", default=str(MENU_SNAPSHOT_FILE))
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        snapshot = MenuSnapshot.from_bytes(MENU_FILE.read_bytes(), INFO_FILE.read_bytes())
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        sys.exit(1)
+    compiled = time.perf_counter() - started
+
+    errors, warnings = check_content(snapshot)
+    for message in warnings:
+        print(f"warning: {message}", file=sys.stderr)
+    for message in errors:
+        print(f"error: {message}", file=sys.stderr)
+    print(f"{len(snapshot.nodes)} вузлів, {len(snapshot.plans)} відповідей, компіляція {compiled * 1000:.1f} мс; "
+          f"помилок {len(errors)}, попереджень {len(warnings)}")
+    failed = bool(errors or (args.strict and warnings))
+    if not args.check and (args.force or not failed):
+        size = write_compiled_snapshot(snapshot, args.output)
+        print(f"{args.output}: {size} байт, хеш {snapshot.digest[:12]}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+# tools/fake_bot_api.py
+"""
+Локальна заміна Telegram Bot API (aiohttp) для навантажувальних тестів.
+
+Бот спрямовується сюди через TG_API_BASE_URL=http://127.0.0.1:<port>/bot — далі він
+працює як зі справжнім Telegram: getMe, setWebhook, sendMessage, editMessageText,
+answerCallbackQuery, sendPhoto, sendMediaGroup, deleteMessage(s). Відповіді мінімальні,
+але валідні для python-telegram-bot (Message з chat/date/photo тощо).
+
+Налаштовується штучна затримка кожного виклику (latency ± jitter) і частка відповідей
+429 з retry_after — щоб перевірити, як бот поводиться під лімітами Telegram.
+
+Запуск окремо:
+    python -m tools.fake_bot_api --port 8081 --latency 50 --retry-after-rate 0.01
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import time
+from collections import Counter, defaultdict
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# Параметри, які PTB передає «як є», без JSON-кодування (решта — json.dumps)
+RAW_PARAMS = frozenset({
+    "text", "caption", "photo", "parse_mode", "callback_query_id", "url",
+    "secret_token", "emoji", "switch_pm_text", "inline_query_id",
+})
+# Службові методи не отримують штучних 429 — інакше бот може не стартувати
+NO_FAULT_METHODS = frozenset({"getMe", "setWebhook", "deleteWebhook", "getWebhookInfo", "close", "logOut"})
+
+BOT_USER = {"id": 1000000001, "is_bot": True, "first_name": "Fake", "username": "fake_bot",
+            "can_join_groups": True, "can_read_all_group_messages": False, "supports_inline_queries": True}
+
+
+def _decode_params(raw) -> dict:
+    params = {}
+    for key, value in raw.items():
+        if not isinstance(value, str):
+            continue  # завантажені файли — вміст нас не цікавить
+        if key in RAW_PARAMS:
+            params[key] = value
+            continue
+        try:
+            params[key] = json.loads(value)
+        except ValueError:
+            params[key] = value
+    return params
+
+
+def _photo_sizes(media) -> list:
+    """PhotoSize для надісланої картинки: file_id стабільний для того самого URL/file_id."""
+    ref = media if isinstance(media, str) else "upload"
+    if ref.startswith("fake-"):
+        file_id = ref
+    else:
+        file_id = "fake-" + hashlib.sha1(ref.encode("utf-8")).hexdigest()[:20]
+    return [
+        {"file_id": file_id + "-s", "file_unique_id": file_id[5:17] + "s", "width": 90, "height": 60},
+        {"file_id": file_id, "file_unique_id": file_id[5:17], "width": 1280, "height": 853},
+    ]
+
+
+class FakeBotAPI:
+    """
+    Стан фейкового сервера: лічильники викликів, нумерація повідомлень по чатах і слухачі,
+    яким повідомляється кожен успішний виклик (так навантажувальний тест бачить відповіді бота).
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0,
+                 retry_after_rate: float = 0.0, retry_after: int = 1, seed: int = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.retry_after_rate = retry_after_rate
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._message_ids = defaultdict(int)
+        self._listeners = []
+        self.calls = Counter()
+        self.faults = Counter()
+        self.webhook = None  # останній setWebhook: {"url": ..., "secret_token": ...}
+
+    def add_listener(self, listener):
+        """listener(method, params, result) — викликається після кожної успішної відповіді."""
+        self._listeners.append(listener)
+
+    def reset_stats(self):
+        self.calls.clear()
+        self.faults.clear()
+
+    def stats(self) -> dict:
+        return {
+            "calls": dict(self.calls),
+            "total_calls": sum(self.calls.values()),
+            "retry_after_sent": dict(self.faults),
+        }
+
+    # --- HTTP ---
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route("*", "/bot{token}/{method}", self._handle)
+        return app
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        if request.content_type == "application/json":
+            params = await request.json()
+        else:
+            params = _decode_params(await request.post())
+
+        delay = self.latency + (self._random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if (self.retry_after_rate and method not in NO_FAULT_METHODS
+                and self._random.random() < self.retry_after_rate):
+            self.faults[method] += 1
+            return web.json_response({
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }, status=429)
+
+        self.calls[method] += 1
+        result = self._result(method, params)
+        for listener in self._listeners:
+            try:
+                listener(method, params, result)
+            except Exception:
+                logger.exception("Fake Bot API listener failed")
+        return web.json_response({"ok": True, "result": result})
+
+    # --- відповіді методів ---
+
+    def _message(self, chat_id, message_id=None, **fields) -> dict:
+        if message_id is None:
+            self._message_ids[chat_id] += 1
+            message_id = self._message_ids[chat_id]
+        chat_type = "private" if isinstance(chat_id, int) and chat_id > 0 else "supergroup"
+        message = {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": chat_type},
+            "from": BOT_USER,
+        }
+        message.update({k: v for k, v in fields.items() if v is not None})
+        return message
+
+    def _result(self, method: str, params: dict):
+        chat_id = params.get("chat_id")
+        if method == "getMe":
+            return BOT_USER
+        if method == "setWebhook":
+            self.webhook = {"url": params.get("url"), "secret_token": params.get("secret_token")}
+            return True
+        if method == "deleteWebhook":
+            self.webhook = None
+            return True
+        if method == "getWebhookInfo":
+            return {"url": (self.webhook or {}).get("url", ""), "has_custom_certificate": False,
+                    "pending_update_count": 0}
+        if method in ("sendMessage", "editMessageText"):
+            return self._message(chat_id, params.get("message_id"), text=params.get("text", ""),
+                                 reply_markup=params.get("reply_markup"))
+        if method == "sendPhoto":
+            return self._message(chat_id, photo=_photo_sizes(params.get("photo")),
+                                 caption=params.get("caption"), reply_markup=params.get("reply_markup"))
+        if method == "copyMessage":
+            return {"message_id": self._message(chat_id)["message_id"]}
+        if method == "sendMediaGroup":
+            group_id = str(self._random.getrandbits(48))
+            return [
+                self._message(chat_id, photo=_photo_sizes(item.get("media")),
+                              caption=item.get("caption"), media_group_id=group_id)
+                for item in params.get("media") or ()
+            ]
+        # answerCallbackQuery, deleteMessage(s), setMyCommands, ... — достатньо True
+        return True
+
+
+async def serve(api: FakeBotAPI, host: str, port: int) -> web.AppRunner:
+    """Запускає сервер у поточному циклі подій; зупинка — await runner.cleanup()."""
+    runner = web.AppRunner(api.make_app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--api-host", default="127.0.0.1")
+    parser.add_argument("--api-port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="затримка кожного виклику, мс")
+    parser.add_argument("--jitter", type=float, default=0.0, help="розкид затримки ±, мс")
+    parser.add_argument("--retry-after-rate", type=float, default=0.0,
+                        help="частка викликів, на які відповідати 429 (0..1)")
+    parser.add_argument("--retry-after", type=int, default=1, help="retry_after у відповіді 429, с")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def api_from_args(args) -> FakeBotAPI:
+    return FakeBotAPI(
+        latency=args.latency / 1000,
+        jitter=args.jitter / 1000,
+        retry_after_rate=args.retry_after_rate,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Фейковий Telegram Bot API для локальних тестів")
+    add_arguments(parser)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    api = api_from_args(args)
+    logger.info("Fake Bot API: TG_API_BASE_URL=http://%s:%d/bot", args.api_host, args.api_port)
+    web.run_app(api.make_app(), host=args.api_host, port=args.api_port, access_log=None, print=None)
+    logger.info("Calls: %s", json.dumps(api.stats(), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
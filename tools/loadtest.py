@@ -0,0 +1,364 @@
+# tools/loadtest.py
+"""
+Навантажувальний тест webhook-шляху бота на фейковому Bot API.
+
+Піднімає tools/fake_bot_api.py, (за бажанням) запускає bot.py, спрямований на нього,
+і від імені N віртуальних користувачів надсилає на webhook синтетичні оновлення
+з заданою сумарною частотою:
+  * прогулянки меню — /start і випадкові натискання кнопок з останньої клавіатури,
+    яку бот надіслав цьому чату (тобто реальні callback_data з menu.json);
+  * повні профорієнтаційні тести — /career_test і відповіді на всі питання.
+
+Затримка оновлення — від POST на webhook до першої відповіді бота в цей чат
+(sendMessage / editMessageText на фейковому API). У звіті: p50/p95/p99 за типами
+оновлень, оновлень/с і вихідних викликів Bot API на одне оновлення.
+
+Приклади:
+    python -m tools.loadtest --spawn --users 50 --rate 100 --duration 30
+    WORKER_PROCESSES=4 python -m tools.loadtest --spawn --latency 40 --retry-after-rate 0.01
+    # бот уже запущено з TG_API_BASE_URL=http://127.0.0.1:8081/bot:
+    python -m tools.loadtest --users 20 --rate 0
+"""
+
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+
+import aiohttp
+
+from tools.fake_bot_api import add_arguments, api_from_args, serve
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+CAREER_PREFIXES = ("ct:", "career_ans:")
+# Методи, якими бот «відповідає» користувачу — момент завершення оновлення
+REPLY_METHODS = frozenset({"sendMessage", "editMessageText"})
+FIRST_CHAT_ID = 500000
+
+
+def percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * q
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+class Pacer:
+    """Рівномірно роздає слоти на надсилання: rate оновлень/с на всіх користувачів; 0 — без обмеження."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+
+    async def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        slot = max(now, self._next)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class LoadTest:
+    def __init__(self, api, users: int, rate: float, duration: float, walk_steps: int,
+                 career_share: float, timeout: float, seed: int = None):
+        self.api = api
+        self.users = users
+        self.pacer = Pacer(rate)
+        self.duration = duration
+        self.walk_steps = walk_steps
+        self.career_share = career_share
+        self.timeout = timeout
+        self.random = random.Random(seed)
+        self.webhook_url = None
+        self.secret_token = None
+
+        self._update_ids = itertools.count(1)
+        self._query_ids = itertools.count(1)
+        self._waiters = {}          # chat_id -> Future першої відповіді бота
+        self._screens = {}          # chat_id -> (message_id, text, [callback_data])
+        self.latencies = defaultdict(list)
+        self.sent = 0
+        self.accepted = 0
+        self.rejected = Counter()   # HTTP-статус (або тип помилки) -> кількість
+        self.timeouts = Counter()
+
+        self.webhook_ready = asyncio.Event()
+        api.add_listener(self._on_api_call)
+
+    # --- спостереження за відповідями бота ---
+
+    def _on_api_call(self, method, params, result):
+        if method == "setWebhook":
+            self.webhook_url = params.get("url")
+            self.secret_token = params.get("secret_token") or None
+            self.webhook_ready.set()
+            return
+        if method not in REPLY_METHODS:
+            return
+        chat_id = params.get("chat_id")
+        markup = params.get("reply_markup") or {}
+        buttons = [
+            button["callback_data"]
+            for row in markup.get("inline_keyboard", ())
+            for button in row
+            if button.get("callback_data")
+        ]
+        self._screens[chat_id] = (result["message_id"], result.get("text", ""), buttons)
+        waiter = self._waiters.pop(chat_id, None)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(time.monotonic())
+
+    # --- синтетичні оновлення ---
+
+    @staticmethod
+    def _user(chat_id) -> dict:
+        return {"id": chat_id, "is_bot": False, "first_name": f"Load{chat_id}", "language_code": "uk"}
+
+    def _command_update(self, chat_id, command: str) -> dict:
+        return {
+            "update_id": next(self._update_ids),
+            "message": {
+                "message_id": 10 ** 6 + next(self._query_ids),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private", "first_name": f"Load{chat_id}"},
+                "from": self._user(chat_id),
+                "text": command,
+                "entities": [{"type": "bot_command", "offset": 0, "length": len(command)}],
+            },
+        }
+
+    def _callback_update(self, chat_id, data: str) -> dict:
+        message_id, text, _ = self._screens[chat_id]
+        return {
+            "update_id": next(self._update_ids),
+            "callback_query": {
+                "id": str(next(self._query_ids)),
+                "from": self._user(chat_id),
+                "chat_instance": str(chat_id),
+                "data": data,
+                "message": {
+                    "message_id": message_id,
+                    "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "private", "first_name": f"Load{chat_id}"},
+                    "text": text,
+                },
+            },
+        }
+
+    async def _step(self, session: aiohttp.ClientSession, chat_id, kind: str, update: dict) -> bool:
+        """Надсилає оновлення і чекає першої відповіді бота в чат; False — ланцюжок перервано."""
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self._waiters[chat_id] = waiter
+        await self.pacer.wait()
+        headers = {SECRET_HEADER: self.secret_token} if self.secret_token else None
+        started = time.monotonic()
+        self.sent += 1
+        status = None
+        try:
+            async with session.post(self.webhook_url, json=update, headers=headers) as resp:
+                status = resp.status
+        except aiohttp.ClientError as e:
+            status = type(e).__name__
+        if status != 200:
+            self._waiters.pop(chat_id, None)
+            self.rejected[status] += 1
+            return False
+        self.accepted += 1
+        try:
+            answered = await asyncio.wait_for(waiter, self.timeout)
+        except asyncio.TimeoutError:
+            self._waiters.pop(chat_id, None)
+            self.timeouts[kind] += 1
+            return False
+        self.latencies[kind].append(answered - started)
+        return True
+
+    def _pick(self, chat_id, last: str = None, prefixes=None):
+        buttons = self._screens.get(chat_id, (None, None, ()))[2]
+        if prefixes:
+            buttons = [b for b in buttons if b.startswith(prefixes)]
+        # те саме натискання поспіль бот лише підтвердить (debounce) — без відповіді в чат
+        choices = [b for b in buttons if b != last] or None
+        return self.random.choice(choices) if choices else None
+
+    async def _menu_walk(self, session, chat_id):
+        if not await self._step(session, chat_id, "start", self._command_update(chat_id, "/start")):
+            return
+        last = None
+        for _ in range(self.walk_steps):
+            data = self._pick(chat_id, last)
+            if data is None:
+                return  # тупик (лише URL-кнопки) — наступний сценарій почнеться з /start
+            kind = "career" if data.startswith(CAREER_PREFIXES) else "menu"
+            if not await self._step(session, chat_id, kind, self._callback_update(chat_id, data)):
+                return
+            last = data
+
+    async def _career_test(self, session, chat_id):
+        if not await self._step(session, chat_id, "career_start", self._command_update(chat_id, "/career_test")):
+            return
+        while True:
+            data = self._pick(chat_id, prefixes=CAREER_PREFIXES)
+            if data is None:
+                return  # результат тесту — кнопок відповідей більше немає
+            if not await self._step(session, chat_id, "career", self._callback_update(chat_id, data)):
+                return
+
+    async def _user_loop(self, session, chat_id, deadline):
+        while time.monotonic() < deadline:
+            if self.random.random() < self.career_share:
+                await self._career_test(session, chat_id)
+            else:
+                await self._menu_walk(session, chat_id)
+
+    async def run(self, drain: float = 1.0) -> dict:
+        self.api.reset_stats()
+        started = time.monotonic()
+        deadline = started + self.duration
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        connector = aiohttp.TCPConnector(limit=max(10, self.users))
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            await asyncio.gather(*(
+                self._user_loop(session, FIRST_CHAT_ID + i, deadline) for i in range(self.users)
+            ))
+        elapsed = time.monotonic() - started
+        await asyncio.sleep(drain)  # добрати хвіст фонових викликів (картинки, видалення)
+        return self.report(elapsed)
+
+    def report(self, elapsed: float) -> dict:
+        def summary(values):
+            return {
+                "count": len(values),
+                "p50_ms": round(percentile(values, 0.50) * 1000, 1),
+                "p95_ms": round(percentile(values, 0.95) * 1000, 1),
+                "p99_ms": round(percentile(values, 0.99) * 1000, 1),
+                "max_ms": round(max(values, default=0.0) * 1000, 1),
+            }
+
+        everything = [v for values in self.latencies.values() for v in values]
+        api_stats = self.api.stats()
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "users": self.users,
+            "sent": self.sent,
+            "accepted": self.accepted,
+            "answered": len(everything),
+            "rejected": {str(k): v for k, v in self.rejected.items()},
+            "timeouts": dict(self.timeouts),
+            "updates_per_s": round(len(everything) / elapsed, 1) if elapsed else 0.0,
+            "api_calls_per_update": round(api_stats["total_calls"] / self.accepted, 2) if self.accepted else 0.0,
+            "latency": summary(everything),
+            "latency_by_kind": {kind: summary(values) for kind, values in sorted(self.latencies.items())},
+            "api": api_stats,
+        }
+
+
+def format_report(report: dict) -> str:
+    lines = [
+        f"elapsed {report['elapsed_s']} s, users {report['users']}: sent {report['sent']}, "
+        f"accepted {report['accepted']}, answered {report['answered']}",
+        f"throughput: {report['updates_per_s']} updates/s, "
+        f"{report['api_calls_per_update']} Bot API calls/update",
+    ]
+    if report["rejected"]:
+        lines.append(f"rejected: {report['rejected']}")
+    if report["timeouts"]:
+        lines.append(f"timeouts: {report['timeouts']}")
+    lines.append(f"{'kind':<14}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    rows = list(report["latency_by_kind"].items()) + [("all", report["latency"])]
+    for kind, s in rows:
+        lines.append(f"{kind:<14}{s['count']:>8}{s['p50_ms']:>10}{s['p95_ms']:>10}{s['p99_ms']:>10}{s['max_ms']:>10}")
+    calls = ", ".join(f"{m}={n}" for m, n in sorted(report["api"]["calls"].items()))
+    lines.append(f"api calls: {calls}")
+    if report["api"]["retry_after_sent"]:
+        lines.append(f"429 injected: {report['api']['retry_after_sent']}")
+    return "\n".join(lines)
+
+
+def spawn_bot(args) -> subprocess.Popen:
+    """Запускає bot.py, спрямований на фейковий Bot API; змінні оточення (WORKER_PROCESSES тощо) успадковуються."""
+    env = dict(os.environ)
+    env.update({
+        "TG_API_BASE_URL": f"http://{args.api_host}:{args.api_port}/bot",
+        "WEBHOOK_URL": f"http://127.0.0.1:{args.bot_port}",
+        "PORT": str(args.bot_port),
+        "PYTHONUNBUFFERED": "1",
+    })
+    env.setdefault("TG_BOT_TOKEN", "123456:LOADTEST")
+    # окремий стан, щоб не змішувати тестові сесії й file_id з робочими
+    env.setdefault("STATE_DIR", os.path.join(BASE_DIR, "state", "loadtest"))
+    output = None if args.verbose else subprocess.DEVNULL
+    return subprocess.Popen([sys.executable, os.path.join(BASE_DIR, "bot.py")], cwd=BASE_DIR, env=env,
+                            stdout=output, stderr=output)
+
+
+async def main_async(args) -> dict:
+    api = api_from_args(args)
+    test = LoadTest(api, users=args.users, rate=args.rate, duration=args.duration,
+                    walk_steps=args.walk_steps, career_share=args.career_share,
+                    timeout=args.timeout, seed=args.seed)
+    runner = await serve(api, args.api_host, args.api_port)
+    bot = None
+    try:
+        if args.webhook:
+            test.webhook_url = args.webhook
+            test.secret_token = args.secret or None
+        else:
+            if args.spawn:
+                bot = spawn_bot(args)
+            print(f"waiting for setWebhook on http://{args.api_host}:{args.api_port}/bot ...", file=sys.stderr)
+            await asyncio.wait_for(test.webhook_ready.wait(), args.startup_timeout)
+            await asyncio.sleep(0.5)  # сервер бота піднімається одразу після setWebhook
+        return await test.run()
+    finally:
+        if bot is not None:
+            bot.terminate()
+            with contextlib.suppress(subprocess.TimeoutExpired):
+                await asyncio.get_running_loop().run_in_executor(None, bot.wait, 15)
+            if bot.poll() is None:
+                bot.kill()
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Навантажувальний тест webhook-шляху бота")
+    add_arguments(parser)
+    parser.add_argument("--spawn", action="store_true", help="запустити bot.py, спрямований на фейковий API")
+    parser.add_argument("--bot-port", type=int, default=8088, help="порт webhook-сервера бота при --spawn")
+    parser.add_argument("--webhook", default=None,
+                        help="URL webhook бота; без нього береться з setWebhook, який бот робить при старті")
+    parser.add_argument("--secret", default=os.getenv("WEBHOOK_SECRET", ""))
+    parser.add_argument("--users", type=int, default=20, help="кількість віртуальних користувачів (чатів)")
+    parser.add_argument("--rate", type=float, default=50.0, help="сумарна частота оновлень/с; 0 — без обмеження")
+    parser.add_argument("--duration", type=float, default=20.0, help="тривалість, с")
+    parser.add_argument("--walk-steps", type=int, default=8, help="натискань за одну прогулянку меню")
+    parser.add_argument("--career-share", type=float, default=0.2, help="частка сценаріїв «профорієнтаційний тест»")
+    parser.add_argument("--timeout", type=float, default=10.0, help="скільки чекати відповіді бота, с")
+    parser.add_argument("--startup-timeout", type=float, default=60.0)
+    parser.add_argument("--json", dest="json_path", default=None, help="зберегти звіт у JSON-файл")
+    parser.add_argument("--verbose", action="store_true", help="показувати вивід запущеного бота")
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+    print(format_report(report))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()